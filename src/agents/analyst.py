@@ -1,142 +1,62 @@
-import os
-from typing import Optional
+import time
+from typing import List, Optional
 import uuid
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
 from langgraph.checkpoint.memory import MemorySaver
 
 from src.config import get_settings
 from src.agents.critic import CriticAgent
-from src.execution.sandbox import DockerSandbox
+from src.agents.gateway import get_llm
+from src.execution.cache import get_execution_cache
+from src.execution.output import ExecutionResult
+from src.execution.sandbox import get_sandbox
+from src.prompts.registry import get_prompt
 from src.schemas.state import AgentState
 from src.utils.parsing import clean_markdown_code
 
-from src.utils.logger import observe_node
-
-# --- NODE FUNCTIONS ---
-
-
-@observe_node(event_type="THOUGHT")
-def generate(state: AgentState):
-    messages = state["messages"]
-    error = state.get("error")
-    evaluation = state.get("evaluation")
-
-    if error:
-        messages.append(
-            HumanMessage(
-                content=f"The previous code failed with this error:\n{error}\n"
-                "Please fix the code and try again."
-            )
-        )
-
-    if evaluation and "REJECT" in evaluation:
-        messages.append(
-            HumanMessage(
-                content=f"The code was rejected by the reviewer:\n{evaluation}\n"
-                "Please fix the logic errors."
-            )
-        )
-
-    # Use the pure logic function, avoiding class instantiation loop
-    last_message = messages[-1].content
-    sql_query = state.get("sql_query")
-    
-    code = _generate_code_logic(last_message, sql_query)
-
-    return {
-        "code": code,
-        "iterations": state.get("iterations", 0) + 1,
-        "error": None,
-        "evaluation": None,
-    }
-
-
-@observe_node(event_type="THOUGHT")
-def critique(state: AgentState):
-    code = state["code"]
-    messages = state["messages"]
-    
-    # Find the last user message to evaluate against
-    user_question = "Unknown question"
-    for m in reversed(messages):
-        if isinstance(m, HumanMessage):
-            user_question = m.content
-            break
-
-    # Internal instantiation is fine here
-    from src.agents.critic import CriticAgent
-
-    critic = CriticAgent()
-    evaluation = critic.review_code(user_question, code)
-
-    return {"evaluation": evaluation}
-
-
-# --- NOTE: The AnalystAgent class has been refactored into src/graph/workflow.py (AuditGraph).
-# This file now only contains the node functions used by the graph.
-
-
-@observe_node(event_type="TOOL_CALL")
-def execute(state: AgentState):
-    code = state["code"]
-    sandbox = DockerSandbox()
-    result = sandbox.execute(code)
-
-    if (
-        result.startswith("Execution Error")
-        or result.startswith("System Error")
-        or "Traceback" in result
-    ):
-        return {"output": result, "error": result}
-    else:
-        return {"output": result, "error": None}
-
-
-def _build_prompt():
-    prompts_dir = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", "components"
-    )
-
-    components = ["identity.md", "rules.md", "examples.md"]
-    parts = []
-
-    for comp in components:
-        path = os.path.join(prompts_dir, comp)
-        with open(path, "r") as f:
-            parts.append(f.read())
-
-    return "\n\n".join(parts)
-
-
-def _load_static_prompt(filename: str) -> str:
-    path = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", filename
-    )
-    with open(path, "r") as f:
-        return f.read()
-
-
-def _generate_code_logic(user_question: str, sql_query: Optional[str] = None) -> str:
+from src.utils.logger import logger, observe_node
+
+
+def _execute_cached(code: str) -> ExecutionResult:
+    """
+    Runs code in the sandbox unless the same script already ran against the
+    current data generation (critic retries, repeated questions).
+    """
+    cache = get_execution_cache()
+    cached = cache.get(code)
+    if cached is not None:
+        logger.debug("Execution cache hit")
+        return ExecutionResult(cached, {"cached": True})
+
+    started_at = time.perf_counter()
+    result = get_sandbox().execute(code)
+    result.stats["cached"] = False
+    result.stats["total_ms"] = round((time.perf_counter() - started_at) * 1000, 2)
+    cache.put(code, result.output)
+    return result
+
+
+def _generate_code_logic(
+    user_question: str,
+    sql_query: Optional[str] = None,
+    sql_warnings: Optional[List[str]] = None,
+) -> str:
     """Core logic to generate code using LLM."""
-    settings = get_settings()
-    model_name = settings["agent"]["analyst_model"]
-    llm = ChatOpenAI(model=model_name, temperature=0)
+    llm = get_llm("analyst")
 
-    system_instructions = _build_prompt()
-    
     # Inject the SQL from Fiscal Agent if available
     input_text = f"User Question: {user_question}"
     if sql_query:
         input_text += f"\n\nPre-Generated, Validated SQL by Fiscal Agent (USE THIS):\n```sql\n{sql_query}\n```\nMake sure to use `query_sql(sql_query)` with this exact query."
+        if sql_warnings:
+            # Likely empty results: the code should check for them
+            warnings = "\n".join(f"- {w}" for w in sql_warnings)
+            input_text += f"\n\nSQL validation warnings:\n{warnings}"
 
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", system_instructions), ("user", "{input}")]
-    )
-    chain = prompt | llm
+    # Static analyst prompt (identity + rules + examples) as the system prefix
+    chain = get_prompt("analyst") | llm
     response = chain.invoke({"input": input_text})
 
     return clean_markdown_code(response.content)
@@ -145,6 +65,7 @@ def _generate_code_logic(user_question: str, sql_query: Optional[str] = None) ->
 # --- NODE FUNCTIONS ---
 
 
+@observe_node(event_type="THOUGHT")
 def generate(state: AgentState):
     print("--- NODE: GENERATE ---")
     messages = state["messages"]
@@ -171,7 +92,7 @@ def generate(state: AgentState):
     last_message = messages[-1].content
     sql_query = state.get("sql_query")
     
-    code = _generate_code_logic(last_message, sql_query)
+    code = _generate_code_logic(last_message, sql_query, state.get("sql_warnings"))
 
     return {
         "code": code,
@@ -181,6 +102,7 @@ def generate(state: AgentState):
     }
 
 
+@observe_node(event_type="THOUGHT")
 def critique(state: AgentState):
     print("--- NODE: CRITIC ---")
     code = state["code"]
@@ -207,21 +129,21 @@ def critique(state: AgentState):
 # This file now only contains the node functions used by the graph.
 
 
+@observe_node(event_type="TOOL_CALL")
 def execute(state: AgentState):
     print("--- NODE: EXECUTE ---")
     code = state["code"]
     print(f"EXECUTING CODE:\n{code}\n----------------")
-    sandbox = DockerSandbox()
-    result = sandbox.execute(code)
+    result, stats = _execute_cached(code)
 
     if (
         result.startswith("Execution Error")
         or result.startswith("System Error")
         or "Traceback" in result
     ):
-        return {"output": result, "error": result}
+        return {"output": result, "error": result, "execution_stats": stats}
     else:
-        return {"output": result, "error": None}
+        return {"output": result, "error": None, "execution_stats": stats}
 
 
 def should_continue(state: AgentState):
@@ -1,9 +1,5 @@
-import os
-
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-
-from src.config import get_settings
+from src.agents.gateway import get_llm
+from src.prompts.registry import get_prompt
 
 
 class CriticAgent:
@@ -16,32 +12,11 @@ class CriticAgent:
     """
 
     def __init__(self):
-        settings = get_settings()
-        try:
-            model_name = settings["agent"]["critic_model"]
-        except KeyError as e:
-            raise ValueError("Missing 'agent.critic_model' in config.yaml") from e
-
-        # Using standard OPENAI_API_KEY from environment
-        self.llm = ChatOpenAI(model=model_name, temperature=0)
-        self.prompt = self._build_prompt()
-
-    def _build_prompt(self):
-        prompt_path = os.path.join(
-            os.path.dirname(__file__), "..", "prompts", "critic_system.md"
-        )
-        with open(prompt_path, "r") as f:
-            system_instructions = f.read()
-
-        return ChatPromptTemplate.from_messages(
-            [
-                ("system", system_instructions),
-                (
-                    "user",
-                    "User Question: {question}\n\nGenerated Code:\n"
-                    "```python\n{code}\n```",
-                ),
-            ]
+        # Shared client from the model gateway (agent.critic_model)
+        self.llm = get_llm("critic")
+        self.prompt = get_prompt(
+            "critic_system",
+            "User Question: {question}\n\nGenerated Code:\n```python\n{code}\n```",
         )
 
     def review_code(self, question: str, code: str) -> str:
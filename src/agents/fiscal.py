@@ -3,49 +3,22 @@ import os
 from typing import Dict, Any, List
 
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langchain_community.callbacks import get_openai_callback
 
+from src.agents.gateway import get_llm
+from src.prompts.registry import get_prompt
 from src.schemas.state import AgentState
-from src.tools.database import query_sql, list_tables, describe_table
+from src.tools.database import query_sql, list_tables
+from src.tools.schema_context import build_schema_context
+from src.tools.sql_validation import validate_sql
 
-# --- SYSTEM PROMPTS ---
+# --- PROMPTS ---
+# Static system prompts (src/prompts/fiscal_*.md) followed by the variable
+# parts, so the system prefix is identical across calls
 
-GENERATE_SQL_PROMPT = """
-You are a SQL Expert for a SQLite database containing public audit data (tenders, expenses, revenues).
-Your Goal: Given a user question, generate a correct executable SQL query.
+GENERATE_SQL_INPUT = "{schema_context}\n\nQuestion: {question}"
 
-DIALECT: SQLite
-RULES:
-1. PUSH DOWN COMPUTATION: Do NOT select all columns. Use SUM(), COUNT(), etc. whenever possible.
-2. QUOTE VALUES: `where exercicio_orcamento = '2024'` (String comparison).
-3. JSON HANDLING: Some columns are JSON. You generally don't need to parse them in SQL, just select the columns asked.
-4. ONLY SELECT queries. No DML.
-5. IF the question requires data from multiple tables, use JOIN.
-6. RETURN ONLY THE RAW SQL. No markdown blocks, no 'Here is the code'. Just the SQL string.
-
-Schema Context:
-{schema_context}
-"""
-
-CHECK_SQL_PROMPT = """
-You are a Senior SQL Reviewer.
-Check the following SQLite query for common mistakes:
-1. Syntax errors
-2. Column hallucination (columns that don't exist in schema)
-3. Data type mismatches (quoting years '2024')
-4. Logical errors (using WHERE instead of HAVING)
-
-Query:
-{query}
-
-Schema Context:
-{schema_context}
-
-If the query is VALID, output: VALID
-If the query is INVALID, output the CORRECTED query (JUST the SQL).
-"""
+CHECK_SQL_INPUT = "Query:\n{query}\n\nErrors:\n{errors}\n\n{schema_context}"
 
 from src.utils.logger import observe_node
 
@@ -61,20 +34,19 @@ def list_tables_node(state: AgentState):
 def get_schema_node(state: AgentState):
     print("--- FISCAL: GET SCHEMA ---")
     messages = state["messages"]
-    
-    # Simple heuristic: Get schema for all main tables to ensure context.
-    # In a larger DB, we would use an LLM to decide which tables to fetch.
-    # For now, we fetch 'licitacoes', 'despesas', 'receitas' if present.
-    
-    target_tables = ["licitacoes", "despesas", "receitas"]
-    schemas = []
-    
-    for t in target_tables:
-        s = describe_table(t)
-        if "not found" not in s:
-            schemas.append(s)
-            
-    schema_text = "\n\n".join(schemas)
+
+    # Only the tables, columns and codes relevant to the question (and the
+    # plan, when the planner already finished), within
+    # `agent.schema_token_budget`
+    user_question = ""
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage) and not m.content.startswith(
+            ("Here is the execution plan", "Available tables:", "Schema Context:")
+        ):
+            user_question = m.content
+            break
+
+    schema_text = build_schema_context(f"{user_question}\n{state.get('plan') or ''}")
     return {"messages": [HumanMessage(content=f"Schema Context:\n{schema_text}")]}
 
 @observe_node(event_type="THOUGHT")
@@ -95,12 +67,9 @@ def generate_query_node(state: AgentState):
             elif "Available tables:" not in m.content:
                 user_question = m.content
 
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", GENERATE_SQL_PROMPT),
-        ("human", "{question}")
-    ])
-    
+    llm = get_llm("fiscal")
+    prompt = get_prompt("fiscal_generate", GENERATE_SQL_INPUT)
+
     chain = prompt | llm
     response = chain.invoke({
         "schema_context": schema_context,
@@ -117,30 +86,41 @@ def check_query_node(state: AgentState):
     print("--- FISCAL: CHECK SQL ---")
     sql_query = state["sql_query"]
     messages = state["messages"]
-    
-    schema_context = ""
-    for m in messages:
-        if isinstance(m, HumanMessage) and "Schema Context:" in m.content:
-            schema_context = m.content
-            
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", CHECK_SQL_PROMPT),
-    ])
-    
-    chain = prompt | llm
-    response = chain.invoke({
-        "query": sql_query,
-        "schema_context": schema_context
-    })
-    
-    result = response.content.strip()
-    
-    if result == "VALID":
-        print("SQL Verdict: VALID")
-        return {"sql_query": sql_query}
+
+    # Deterministic validation against the real schema; the LLM only
+    # repairs queries that fail it
+    validation = validate_sql(sql_query)
+    for fix in validation["fixes"]:
+        print(f"SQL Fix: {fix}")
+
+    if not validation["valid"]:
+        print(f"SQL Verdict: INVALID ({'; '.join(validation['errors'])})")
+        schema_context = ""
+        for m in messages:
+            if isinstance(m, HumanMessage) and "Schema Context:" in m.content:
+                schema_context = m.content
+
+        llm = get_llm("fiscal")
+        prompt = get_prompt("fiscal_check", CHECK_SQL_INPUT)
+
+        chain = prompt | llm
+        response = chain.invoke({
+            "query": sql_query,
+            "errors": "\n".join(f"- {e}" for e in validation["errors"]),
+            "schema_context": schema_context
+        })
+
+        corrected = response.content.replace("```sql", "").replace("```", "").strip()
+        validation = validate_sql(corrected)
+        if validation["valid"]:
+            print(f"SQL Verdict: FIXED -> {validation['sql']}")
+        else:
+            print(f"SQL Verdict: STILL INVALID ({'; '.join(validation['errors'])})")
     else:
-        # The output is the corrected query
-        corrected = result.replace("```sql", "").replace("```", "").strip()
-        print(f"SQL Verdict: FIXED -> {corrected}")
-        return {"sql_query": corrected}
+        print("SQL Verdict: VALID")
+
+    for warning in validation["warnings"]:
+        print(f"SQL Warning: {warning}")
+
+    # Warnings (likely empty results) go to the analyst prompt with the SQL
+    return {"sql_query": validation["sql"], "sql_warnings": validation["warnings"]}
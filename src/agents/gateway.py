@@ -0,0 +1,212 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langchain_openai import ChatOpenAI
+
+from src.agents.llm_cache import LLMCache
+from src.config import get_settings
+from src.utils.logger import logger
+
+# Model per agent role; `agent.models` overrides, `agent.analyst_model` and
+# `agent.critic_model` are kept for existing configs.
+DEFAULT_MODELS = {
+    "guardrail": "gpt-4o-mini",
+    "planner": "gpt-4o",
+    "fiscal": "gpt-4o",
+    "analyst": "gpt-4o",
+    "critic": "gpt-4o-mini",
+}
+DEFAULT_MAX_CONCURRENCY = 8
+# Retries with exponential backoff; the OpenAI client honours Retry-After
+# on 429/5xx responses
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_REQUEST_TIMEOUT = 120
+
+
+class ModelGateway:
+    """
+    Process-wide access point for chat models. Keeps one client per model
+    (so HTTP connections are pooled and reused across nodes and requests),
+    bounds concurrent calls per model, retries rate-limited calls, records
+    latency and token usage per call and serves opted-in roles from the
+    on-disk response cache.
+    """
+
+    def __init__(self):
+        settings = get_settings().get("agent", {})
+        self.models = dict(DEFAULT_MODELS)
+        for role in ("analyst", "critic"):
+            if settings.get(f"{role}_model"):
+                self.models[role] = settings[f"{role}_model"]
+        self.models.update(settings.get("models") or {})
+
+        gateway_settings = settings.get("gateway", {})
+        limits = dict(gateway_settings.get("max_concurrency") or {})
+        self.default_limit = limits.pop("default", DEFAULT_MAX_CONCURRENCY)
+        self.limits = limits
+        self.max_retries = gateway_settings.get("max_retries", DEFAULT_MAX_RETRIES)
+        self.request_timeout = gateway_settings.get(
+            "request_timeout", DEFAULT_REQUEST_TIMEOUT
+        )
+
+        self._lock = threading.Lock()
+        self._clients: Dict[str, ChatOpenAI] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._runnables: Dict[str, Runnable] = {}
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self.cache = LLMCache()
+
+    def model_for(self, role: str) -> str:
+        try:
+            return self.models[role]
+        except KeyError as e:
+            raise ValueError(f"No model configured for role '{role}'") from e
+
+    def _client(self, model: str) -> ChatOpenAI:
+        with self._lock:
+            if model not in self._clients:
+                self._clients[model] = ChatOpenAI(
+                    model=model,
+                    temperature=0,
+                    max_retries=self.max_retries,
+                    timeout=self.request_timeout,
+                )
+                self._semaphores[model] = threading.BoundedSemaphore(
+                    self.limits.get(model, self.default_limit)
+                )
+            return self._clients[model]
+
+    def _stats(self, model: str) -> Dict[str, Any]:
+        if model not in self._metrics:
+            self._metrics[model] = {
+                "calls": 0,
+                "failed": 0,
+                "input_tokens": 0,
+                "cached_input_tokens": 0,
+                "output_tokens": 0,
+                "total_wait_ms": 0.0,
+                "total_latency_ms": 0.0,
+                "max_latency_ms": 0.0,
+            }
+        return self._metrics[model]
+
+    def _call(self, role: str, model: str, messages, config: RunnableConfig):
+        cache_key = None
+        if self.cache.enabled_for(role):
+            cache_key = self.cache.key(model, messages, {"temperature": 0})
+            cached = self.cache.get(cache_key, role)
+            if cached is not None:
+                return cached
+
+        response = self._call_model(role, model, messages, config)
+        if cache_key:
+            self.cache.put(cache_key, role, model, response)
+        return response
+
+    def _call_model(self, role: str, model: str, messages, config: RunnableConfig):
+        client = self._client(model)
+        queued_at = time.perf_counter()
+        with self._semaphores[model]:
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            started_at = time.perf_counter()
+            response = None
+            try:
+                response = client.invoke(messages, config=config)
+                return response
+            finally:
+                latency_ms = (time.perf_counter() - started_at) * 1000
+                self._record(role, model, response, wait_ms, latency_ms)
+
+    def _record(self, role, model, response, wait_ms, latency_ms):
+        usage = getattr(response, "usage_metadata", None) or {}
+        # Input tokens served from the provider's prompt prefix cache
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        with self._lock:
+            stats = self._stats(model)
+            stats["calls"] += 1
+            stats["failed"] += response is None
+            stats["input_tokens"] += usage.get("input_tokens", 0)
+            stats["cached_input_tokens"] += cached_tokens or 0
+            stats["output_tokens"] += usage.get("output_tokens", 0)
+            stats["total_wait_ms"] += wait_ms
+            stats["total_latency_ms"] += latency_ms
+            stats["max_latency_ms"] = max(stats["max_latency_ms"], latency_ms)
+
+        logger.info(
+            f"LLM call {role}/{model}",
+            extra={
+                "structured_data": {
+                    "event_type": "LLM_CALL",
+                    "role": role,
+                    "model": model,
+                    "status": "SUCCESS" if response is not None else "ERROR",
+                    "wait_ms": round(wait_ms, 2),
+                    "latency_ms": round(latency_ms, 2),
+                    "input_tokens": usage.get("input_tokens"),
+                    "cached_input_tokens": cached_tokens,
+                    "output_tokens": usage.get("output_tokens"),
+                }
+            },
+        )
+
+    def get_llm(self, role: str) -> Runnable:
+        """Chat model for an agent role, usable in chains (`prompt | llm`)."""
+        with self._lock:
+            if role in self._runnables:
+                return self._runnables[role]
+        model = self.model_for(role)
+
+        def _invoke(messages, config: RunnableConfig):
+            return self._call(role, model, messages, config)
+
+        runnable = RunnableLambda(_invoke, name=f"llm_{role}")
+        with self._lock:
+            return self._runnables.setdefault(role, runnable)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Per-model call counts, token totals, latencies and prompt prefix
+        cache hit rate (share of input tokens read from the provider cache).
+        """
+        with self._lock:
+            models = {}
+            for model, stats in self._metrics.items():
+                calls = stats["calls"] or 1
+                models[model] = {
+                    **stats,
+                    "limit": self.limits.get(model, self.default_limit),
+                    "prefix_cache_hit_rate": round(
+                        stats["cached_input_tokens"] / stats["input_tokens"], 3
+                    )
+                    if stats["input_tokens"]
+                    else 0.0,
+                    "avg_wait_ms": round(stats["total_wait_ms"] / calls, 2),
+                    "avg_latency_ms": round(stats["total_latency_ms"] / calls, 2),
+                    "total_wait_ms": round(stats["total_wait_ms"], 2),
+                    "total_latency_ms": round(stats["total_latency_ms"], 2),
+                    "max_latency_ms": round(stats["max_latency_ms"], 2),
+                }
+            return {
+                "routes": dict(self.models),
+                "models": models,
+                "cache": self.cache.metrics(),
+            }
+
+
+_gateway: Optional[ModelGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> ModelGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = ModelGateway()
+        return _gateway
+
+
+def get_llm(role: str) -> Runnable:
+    """Shortcut for `get_gateway().get_llm(role)`."""
+    return get_gateway().get_llm(role)
@@ -1,19 +1,11 @@
 
-import os
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from src.agents.gateway import get_llm
+from src.agents.guardrail_local import get_local_guardrail
+from src.prompts.registry import get_prompt
 from src.schemas.state import AgentState
 from src.utils.logger import observe_node
 
-def _load_static_prompt(filename: str) -> str:
-    # Assumes file is in src/agents/../prompts
-    path = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", filename
-    )
-    with open(path, "r") as f:
-        return f.read()
-
 @observe_node(event_type="GUARDRAIL")
 def guardrail_input(state: AgentState):
     messages = state["messages"]
@@ -25,42 +17,45 @@ def guardrail_input(state: AgentState):
             user_input = m.content
             break
             
-    # Load safety prompt
-    safety_prompt = _load_static_prompt("guardrail_input.md")
-    
-    # Use GPT-4o-mini for cost-effective checks
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    
-    chain = ChatPromptTemplate.from_messages([
-        ("system", safety_prompt),
-        ("human", "{input}")
-    ]) | llm
-    
-    response = chain.invoke({"input": user_input})
-    verdict = response.content.strip().upper()
-    
-    if "UNSAFE" in verdict:
+    # Clear cases are decided locally; ambiguous ones go to the LLM
+    local_guardrail = get_local_guardrail()
+    verdict, source = local_guardrail.classify(user_input)
+
+    if verdict is None:
+        # Cost-effective model for checks (agent.models.guardrail)
+        llm = get_llm("guardrail")
+
+        chain = get_prompt("guardrail_input") | llm
+
+        response = chain.invoke({"input": user_input})
+        verdict = "UNSAFE" if "UNSAFE" in response.content.strip().upper() else "SAFE"
+        # Replayed answers are logged but not learned again, so repeated
+        # questions don't skew the local model
+        if response.response_metadata.get("llm_cache_hit"):
+            source = "llm_cache"
+        else:
+            source = "llm"
+
+    local_guardrail.record(user_input, verdict, source)
+    print(f"--- GUARDRAIL: {verdict} ({source}) ---")
+
+    if verdict == "UNSAFE":
         return {
             "guardrail_verdict": "UNSAFE",
+            "guardrail_source": source,
             "output": "🚫 **Process blocked by Security Policy.**\nYour request was flagged as unsafe or irrelevant to the public audit context."
         }
     
-    return {"guardrail_verdict": "SAFE"}
+    return {"guardrail_verdict": "SAFE", "guardrail_source": source}
 
 @observe_node(event_type="GUARDRAIL")
 def guardrail_output(state: AgentState):
     output = state.get("output", "No output.")
     
-    # Load safety prompt
-    safety_prompt = _load_static_prompt("guardrail_output.md")
-    
-    # Use GPT-4o-mini for cost-effective checks
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    
-    chain = ChatPromptTemplate.from_messages([
-        ("system", safety_prompt),
-        ("human", "{input}")
-    ]) | llm
+    # Cost-effective model for checks (agent.models.guardrail)
+    llm = get_llm("guardrail")
+
+    chain = get_prompt("guardrail_output") | llm
     
     response = chain.invoke({"input": output})
     sanitized_output = response.content.strip()
@@ -0,0 +1,313 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERDICTS_PATH = "logs/guardrail_verdicts.jsonl"
+# Verdicts per class needed before the lexical model answers on its own
+DEFAULT_MIN_SAMPLES = 20
+# Posterior probability required for a model decision; below it the LLM decides
+DEFAULT_MODEL_THRESHOLD = 0.97
+
+# Longest input the rules may pass as SAFE on their own
+MAX_SAFE_CHARS = 200
+
+# Attempts to override instructions, change the data or run code; never in
+# scope. Matched against the normalized (lowercase, accent-free) input.
+UNSAFE_PATTERNS = [
+    # Instruction overrides and role-play
+    r"\b(ignore|disregard|forget|override)\b.{0,40}\b(instructions?|rules|prompt)\b",
+    r"\b(ignore|esqueca|desconsidere)\b.{0,40}\b(instrucoes|regras|prompt)\b",
+    r"\b(system|hidden|secret|internal|initial)\s+(prompt|instructions?)\b",
+    r"\b(prompt|instrucoes)\s+(do sistema|ocultas?|secretas?|internas?|iniciais)\b",
+    r"\b(reveal|print|show|repeat|mostre|revele|imprima|repita)\b.{0,30}"
+    r"\b(your|suas?|seus?)\s+(instructions|instrucoes|regras|rules|prompt)\b",
+    r"\bjailbreak\b",
+    r"\b(developer|god|admin|unrestricted)\s+mode\b",
+    r"\bmodo\s+(desenvolvedor|deus|admin|irrestrito)\b",
+    r"\b(act|behave|roleplay)\s+as\b",
+    r"\b(pretend|imagine)\s+(you|to be)\b",
+    r"\byou\s+are\s+(now|no longer)\b",
+    r"\bdo anything now\b",
+    r"\bdan\s+(mode|modo|prompt)\b|\b(as|como)\s+dan\b",
+    r"\b(finja|finge|fingir|faca de conta)\b",
+    r"\b(aja|atue|comporte-se|responda)\s+como\b",
+    r"\bvoce\s+(agora\s+e|e agora|nao e mais)\b",
+    r"\b(sem|without|no)\s+(restricoes|restrictions|filtros|filters|limites|limits|censura)\b",
+    # Changes to the data (the agent only reads)
+    r"\b(drop|truncate)\s+(table|view|index|database)\b",
+    r"\balter\s+(table|database|view)\b",
+    r"\bcreate\s+(table|view|index|trigger)\b",
+    r"\bdelete\s+from\b",
+    r"\b(insert|replace)\s+into\b",
+    r"\bupdate\s+\w+\s+set\b",
+    r"\b(attach|detach)\s+database\b",
+    r"\bpragma\s+\w+",
+    r"\b(delete|drop|remove)\b.{0,20}\b(all|the)\b.{0,10}\btables?\b",
+    r"\b(apague|apagar|delete|deletar|exclua|excluir|remova|remover)\b.{0,30}\btabelas?\b",
+    r"\b(altere|alterar|atualize|atualizar|zere|zerar|modifique|modificar)\b.{0,30}"
+    r"\b(valor|valores|registros?|tabelas?|dados|pagamentos?|despesas?)\b",
+    r"\b(suma|sumir)\s+com\b",
+    # Code execution and host files
+    r"\brm\s+-rf\b",
+    r"\bos\.(system|popen|exec\w*|spawn\w*|remove|unlink|kill)\b",
+    r"\b(subprocess|__import__|importlib|pickle|ctypes)\b",
+    r"\b(eval|exec|compile|open|system|popen)\s*\(",
+    r"/etc/(passwd|shadow|hosts)|~/\.ssh|\bid_rsa\b",
+    r"\b(cat|curl|wget|chmod|sudo)\s+[-/~]|\b(bash|sh)\s+-c\b",
+]
+
+# Whole-message greetings
+GREETING = re.compile(
+    r"^(oi|ola|hi|hello|hey|bom dia|boa tarde|boa noite|e ai)\b"
+    r"[\s,!.?]*(tudo bem|tudo bom|como vai|how are you)?[\s,!.?]*$"
+)
+
+# Public spending vocabulary (accent-free word prefixes). A match alone is not
+# enough for a SAFE verdict: see LocalGuardrail._benign.
+DOMAIN_TERMS = [
+    "despesa", "gasto", "gastou", "licitac", "licitant", "pregao", "contrat",
+    "orcament", "empenh", "liquidac", "pagamento", "pago", "fornecedor",
+    "credor", "prefeitura", "municipi", "secretaria", "orgao", "dotac",
+    "convenio", "aditivo", "dispensa", "inexigibilidade", "audit", "tce",
+    "sobral", "servidor", "folha", "expense", "spending", "budget", "tender",
+    "contract", "supplier", "vendor", "payment", "procurement", "arrecad",
+    "imposto", "tribut", "receita corrente", "receita tributaria",
+]
+_DOMAIN = re.compile(r"\b(" + "|".join(re.escape(t) for t in DOMAIN_TERMS) + ")")
+
+# Questions and requests a SAFE input starts with (or it ends with "?")
+QUESTION_WORDS = re.compile(
+    r"^(quanto|quantos|quantas|qual|quais|quem|como|onde|quando|por que|o que|"
+    r"existe|existem|houve|teve|liste|listar|mostre|mostrar|compare|comparar|"
+    r"some|somar|calcule|calcular|me (de|diga|mostre|informe)|"
+    r"how|what|which|who|where|when|why|list|show|compare|sum|total|"
+    r"is there|are there|did|does|do)\b"
+)
+
+# Any of these sends an otherwise domain-only input to the LLM: SQL, code,
+# role-play / instruction talk and personal data
+SUSPICIOUS = re.compile(
+    r"\b(select|update|insert|delete|drop|alter|create|pragma|attach|union|"
+    r"truncate|replace|set|exec|import|python|script|shell|comando|command|"
+    r"sql|query|consulta|tabela|table|schema|banco de dados|database|"
+    r"prompt|instruc\w*|instruction\w*|regras|rules|system|"
+    r"assistente|assistant|voce e|you are|role|persona|restric\w*|"
+    r"cpf|rg|senha|password|token|dados pessoais|personal)s?\b"
+    r"|[(){}\[\];=<>`\\|&#*]|--|/\*|\w\.\w+\s*\(|__"
+)
+
+# Common out-of-scope topics. "receita" is in neither list: it is both public
+# revenue and a cooking recipe, so it is decided by its neighbours ("receita
+# de bolo" is off-topic, "receita tributaria" is not, "receita" alone is
+# left to the model or the LLM).
+OFF_TOPIC_TERMS = [
+    "bolo", "cake", "torta", "pudim", "brigadeiro", "lasanha", "culinaria",
+    "cozinhar", "ingrediente", "recipe",
+    "futebol", "football", "soccer", "campeonato", "novela", "filme", "movie",
+    "poema", "poem", "poesia", "musica", "song", "piada", "joke", "horoscopo",
+    "historia do brasil", "capital of",
+]
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-free text used by rules and the lexical model."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = TOKEN.findall(normalize(text))
+    # Bigrams keep short phrases ("receita de", "de bolo") apart from their words
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:], strict=False)]
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over word and bigram counts (add-one smoothing)."""
+
+    def __init__(self):
+        self.docs: Counter = Counter()
+        self.words: Dict[str, Counter] = {}
+        self.totals: Counter = Counter()
+        self.vocabulary = set()
+
+    def learn(self, text: str, label: str):
+        tokens = tokenize(text)
+        self.docs[label] += 1
+        self.words.setdefault(label, Counter()).update(tokens)
+        self.totals[label] += len(tokens)
+        self.vocabulary.update(tokens)
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """(label, posterior probability) of the most likely class."""
+        if not self.docs:
+            return None, 0.0
+        tokens = tokenize(text)
+        total_docs = sum(self.docs.values())
+        vocabulary = len(self.vocabulary) + 1
+        scores = {}
+        for label, docs in self.docs.items():
+            counts = self.words[label]
+            denominator = self.totals[label] + vocabulary
+            scores[label] = math.log(docs / total_docs) + sum(
+                math.log((counts[t] + 1) / denominator) for t in tokens
+            )
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+
+class LocalGuardrail:
+    """
+    Local first stage of the input guardrail. It only rejects, or passes
+    clearly benign inputs: pattern rules reject instruction overrides,
+    role-play, data changes, code and out-of-scope topics, and pass
+    greetings and short, plain questions about public spending; a naive
+    Bayes model trained on the LLM verdicts logged to
+    `agent.guardrail.verdicts_path` decides the rest when confident (SAFE
+    only under the same plainness bar). Anything else goes to the LLM.
+    """
+
+    def __init__(self):
+        settings = get_settings().get("agent", {}).get("guardrail", {})
+        self.enabled = settings.get("local", True)
+        self.verdicts_path = settings.get("verdicts_path", DEFAULT_VERDICTS_PATH)
+        self.min_samples = settings.get("min_samples", DEFAULT_MIN_SAMPLES)
+        self.threshold = settings.get("model_threshold", DEFAULT_MODEL_THRESHOLD)
+
+        self._unsafe = [re.compile(p) for p in UNSAFE_PATTERNS]
+        self._lock = threading.Lock()
+        self.model = NaiveBayes()
+        self._load_verdicts()
+
+    def _load_verdicts(self):
+        """Trains the model on logged LLM verdicts (latest verdict per input)."""
+        latest: Dict[str, str] = {}
+        try:
+            with open(self.verdicts_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("source") == "llm" and entry.get("verdict") in (
+                        "SAFE",
+                        "UNSAFE",
+                    ):
+                        latest[normalize(entry.get("input", ""))] = entry["verdict"]
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Could not read guardrail verdicts: {e}")
+            return
+        for text, verdict in latest.items():
+            self.model.learn(text, verdict)
+        logger.info(f"Local guardrail trained on {len(latest)} verdicts")
+
+    def _rules(self, text: str) -> Optional[str]:
+        if any(p.search(text) for p in self._unsafe):
+            return "UNSAFE"
+        if GREETING.match(text):
+            return "SAFE"
+        domain = bool(_DOMAIN.search(text))
+        off_topic = any(term in text for term in OFF_TOPIC_TERMS)
+        if off_topic and not domain:
+            return "UNSAFE"
+        if domain and not off_topic and self._benign(text):
+            return "SAFE"
+        return None
+
+    @staticmethod
+    def _benign(text: str) -> bool:
+        """
+        Whether an input is plain enough to be passed without the LLM: a
+        short question or request with no SQL, code, role-play or
+        personal-data tokens. Anything else is left to the LLM even when it
+        mentions the domain, since a domain word is easy to add to an attack.
+        """
+        if len(text) > MAX_SAFE_CHARS or SUSPICIOUS.search(text):
+            return False
+        return bool(QUESTION_WORDS.match(text)) or text.endswith("?")
+
+    def _model(self, text: str) -> Optional[str]:
+        with self._lock:
+            samples = min(self.model.docs["SAFE"], self.model.docs["UNSAFE"])
+            if samples < self.min_samples:
+                return None
+            verdict, probability = self.model.predict(text)
+        if probability < self.threshold:
+            return None
+        # Same bar as the rules for letting an input through
+        if verdict == "SAFE" and not self._benign(text):
+            return None
+        return verdict
+
+    def classify(self, user_input: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (verdict, source) with source "rules" or "model", or (None, None)
+        when the input is ambiguous and must go to the LLM.
+        """
+        if not self.enabled:
+            return None, None
+        text = normalize(user_input)
+        verdict = self._rules(text)
+        if verdict:
+            return verdict, "rules"
+        verdict = self._model(text)
+        if verdict:
+            return verdict, "model"
+        return None, None
+
+    def record(self, user_input: str, verdict: str, source: str):
+        """
+        Appends a verdict to the log. Fresh LLM verdicts also update the
+        model right away; local ones and LLM answers replayed from the
+        response cache ("llm_cache") are kept for auditing only.
+        """
+        if source == "llm":
+            with self._lock:
+                self.model.learn(normalize(user_input), verdict)
+        try:
+            directory = os.path.dirname(self.verdicts_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock, open(self.verdicts_path, "a") as f:
+                f.write(
+                    json.dumps(
+                        {
+                            "timestamp": time.time(),
+                            "input": user_input,
+                            "verdict": verdict,
+                            "source": source,
+                        },
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+        except OSError as e:
+            logger.warning(f"Could not log guardrail verdict: {e}")
+
+
+_local_guardrail: Optional[LocalGuardrail] = None
+_local_guardrail_lock = threading.Lock()
+
+
+def get_local_guardrail() -> LocalGuardrail:
+    global _local_guardrail
+    with _local_guardrail_lock:
+        if _local_guardrail is None:
+            _local_guardrail = LocalGuardrail()
+        return _local_guardrail
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+PRUNE_EVERY = 100
+
+# Skips cache reads (responses are still stored, refreshing entries)
+BYPASS_ENV = "LLM_CACHE_BYPASS"
+
+
+class LLMCache:
+    """
+    On-disk cache of chat model responses, keyed by model, the full prompt
+    and call parameters. Only roles listed in `agent.llm_cache.nodes` use
+    it (deterministic steps at temperature 0). Bounded by TTL and by entry
+    count, evicting the least recently used entries.
+    """
+
+    def __init__(self):
+        settings = get_settings().get("agent", {}).get("llm_cache", {})
+        self.enabled = settings.get("enabled", True)
+        self.path = settings.get("path", "data/llm_cache.db")
+        self.ttl_seconds = settings.get("ttl_seconds", DEFAULT_TTL_SECONDS)
+        self.max_entries = settings.get("max_entries", DEFAULT_MAX_ENTRIES)
+        self.roles = set(settings.get("nodes") or [])
+
+        self._ready = False
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def get_connection(self):
+        return sqlite3.connect(self.path, timeout=1)
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY, -- sha256 of model + prompt + params
+                    role TEXT,
+                    model TEXT,
+                    response TEXT, -- serialized AIMessage
+                    created_at REAL,
+                    last_used_at REAL,
+                    hits INTEGER DEFAULT 0
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_used "
+                "ON llm_cache(last_used_at)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self._ready = True
+
+    def enabled_for(self, role: str) -> bool:
+        return self.enabled and role in self.roles
+
+    @staticmethod
+    def key(model: str, messages, params: Dict[str, Any]) -> str:
+        if hasattr(messages, "to_messages"):
+            messages = messages.to_messages()
+        if isinstance(messages, BaseMessage):
+            messages = [messages]
+        prompt = [message_to_dict(m) for m in messages]
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, role: str, outcome: str):
+        with self._lock:
+            role_stats = self.stats.setdefault(
+                role, {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+            )
+            role_stats[outcome] += 1
+
+    def get(self, key: str, role: str) -> Optional[BaseMessage]:
+        """Cached response or None. Best effort: errors count as misses."""
+        if os.environ.get(BYPASS_ENV, "") not in ("", "0"):
+            self._count(role, "bypassed")
+            return None
+        try:
+            self._ensure_schema()
+            conn = self.get_connection()
+            try:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                now = time.time()
+                if row and now - row[1] < self.ttl_seconds:
+                    conn.execute(
+                        "UPDATE llm_cache SET last_used_at = ?, hits = hits + 1 "
+                        "WHERE key = ?",
+                        (now, key),
+                    )
+                    conn.commit()
+                    self._count(role, "hits")
+                    response = messages_from_dict([json.loads(row[0])])[0]
+                    # Lets callers tell a replayed answer from a fresh one
+                    response.response_metadata["llm_cache_hit"] = True
+                    return response
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+        self._count(role, "misses")
+        return None
+
+    def put(self, key: str, role: str, model: str, response: BaseMessage):
+        """Stores a response. Best effort: caching never fails a call."""
+        try:
+            self._ensure_schema()
+            now = time.time()
+            conn = self.get_connection()
+            try:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO llm_cache (
+                        key, role, model, response, created_at, last_used_at
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, role, model, json.dumps(message_to_dict(response)), now, now),
+                )
+                with self._lock:
+                    self._puts += 1
+                    prune = self._puts % PRUNE_EVERY == 1
+                if prune:
+                    self._prune(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+            self._count(role, "stores")
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def _prune(self, conn, now: float):
+        conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        conn.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit rates of this process, per role."""
+        with self._lock:
+            roles = {}
+            for role, role_stats in self.stats.items():
+                lookups = role_stats["hits"] + role_stats["misses"]
+                roles[role] = {
+                    **role_stats,
+                    "hit_rate": round(role_stats["hits"] / lookups, 3)
+                    if lookups
+                    else 0.0,
+                }
+            return {"enabled": self.enabled, "roles": roles}
+
+    def summary(self) -> list[dict]:
+        """Entries and lifetime hits per role, from the cache file."""
+        self._ensure_schema()
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                """
+                SELECT role, model, COUNT(*) AS entries, SUM(hits) AS hits,
+                       MAX(last_used_at) AS last_used_at
+                FROM llm_cache GROUP BY role, model ORDER BY hits DESC
+                """
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # python -m src.agents.llm_cache: lifetime hit counts per role
+    for entry in LLMCache().summary():
+        print(
+            f"{entry['role']:<10} {entry['model']:<16} "
+            f"entries={entry['entries']:<6} hits={entry['hits'] or 0}"
+        )
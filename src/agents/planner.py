@@ -1,16 +1,8 @@
-import os
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from src.agents.gateway import get_llm
+from src.prompts.registry import get_prompt
 from src.schemas.state import AgentState
 
-def _load_static_prompt(filename: str) -> str:
-    path = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", filename
-    )
-    with open(path, "r") as f:
-        return f.read()
-
 from src.utils.logger import observe_node
 
 @observe_node(event_type="THOUGHT")
@@ -24,18 +16,10 @@ def planner(state: AgentState):
             user_input = m.content
             break
             
-    # Load planner prompt
-    planner_prompt = _load_static_prompt("planner.md")
-    
-    # Use a reasoning model (or strong model) for planning
-    # gpt-4o or gpt-4o-mini depending on complexity/cost trade-off. 
-    # Using gpt-4o-mini for speed/efficiency as requested in plan, but could be upgraded.
-    llm = ChatOpenAI(model="gpt-4o", temperature=0) 
-    
-    chain = ChatPromptTemplate.from_messages([
-        ("system", planner_prompt),
-        ("human", "{input}")
-    ]) | llm
+    # Strong model for planning (agent.models.planner)
+    llm = get_llm("planner")
+
+    chain = get_prompt("planner") | llm
     
     response = chain.invoke({"input": user_input})
     plan_text = response.content.strip()
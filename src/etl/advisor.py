@@ -0,0 +1,324 @@
+import argparse
+import logging
+import re
+import sqlite3
+import statistics
+import time
+
+from .database import JSON_PATH_PATTERN, DatabaseManager
+from .query_log import QueryLog
+
+logger = logging.getLogger(__name__)
+
+# Composite indexes are capped at this many key columns
+MAX_INDEX_COLUMNS = 3
+# Timing runs per query (median is reported)
+TIMING_RUNS = 3
+
+_TABLE_REF_RE = re.compile(
+    r"\b(?:from|join)\s+(\w+)(?:\s+(?:as\s+)?(?!where|join|on|group|order|limit"
+    r"|inner|left|right|cross|natural|using|having)(\w+))?",
+    re.I,
+)
+_WHERE_RE = re.compile(
+    r"\bwhere\b(.*?)(?:\bgroup\s+by\b|\border\s+by\b|\blimit\b|\bhaving\b|\)\s*$|$)",
+    re.I | re.S,
+)
+_EQ_RE = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:=|\bin\b\s*\(|\bis\b)", re.I)
+_RANGE_RE = re.compile(r"(?:(\w+)\.)?(\w+)\s*(?:<=|>=|<|>|\bbetween\b|\blike\b)", re.I)
+_EXPR_RE = re.compile(
+    r"\b(json_extract|substr|lower|upper|strftime|cast)\s*\(([^()]*)\)\s*"
+    r"(?:=|<=|>=|<|>|\bin\b|\bbetween\b|\blike\b)",
+    re.I,
+)
+# Same path syntax promote_json_fields accepts
+_JSON_FIELD_RE = re.compile(
+    rf"json_extract\s*\(\s*(?:(\w+)\.)?raw_data\s*,\s*'({JSON_PATH_PATTERN})'\s*\)",
+    re.I,
+)
+_SCAN_RE = re.compile(r"^SCAN (\w+)(?! USING (?:COVERING )?INDEX)", re.I)
+
+
+def _median_ms(conn, sql: str) -> float:
+    timings = []
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _table_columns(conn) -> dict[str, set[str]]:
+    tables = [
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' "
+            "AND name NOT LIKE 'sqlite_%'"
+        )
+    ]
+    return {
+        t: {row[1] for row in conn.execute(f"PRAGMA table_xinfo({t})")} for t in tables
+    }
+
+
+def _indexed_prefixes(conn, table: str) -> set[tuple]:
+    """Leading-column tuples already covered by an index on `table`."""
+    prefixes = set()
+    for idx in conn.execute(f"PRAGMA index_list({table})"):
+        cols = tuple(
+            row[2] or "<expr>" for row in conn.execute(f"PRAGMA index_xinfo({idx[1]})")
+            if row[5]  # key columns only
+        )
+        for n in range(1, len(cols) + 1):
+            prefixes.add(cols[:n])
+    return prefixes
+
+
+def propose_indexes(conn, sql: str) -> list[dict]:
+    """
+    Derives index candidates for one query: for every table the plan scans
+    in full, equality-filtered columns first, then one range column
+    (composite index); filters over expressions get an expression index.
+    """
+    columns = _table_columns(conn)
+    aliases = {}
+    for table, alias in _TABLE_REF_RE.findall(sql):
+        if table in columns:
+            aliases[table] = table
+            if alias:
+                aliases[alias] = table
+
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    scanned = set()
+    for row in plan:
+        match = _SCAN_RE.match(row[3])
+        if match and match.group(1) in aliases:
+            scanned.add(aliases[match.group(1)])
+    if not scanned:
+        return []
+
+    where_match = _WHERE_RE.search(sql)
+    where = where_match.group(1) if where_match else ""
+
+    def _resolve(qualifier, column):
+        if qualifier:
+            table = aliases.get(qualifier)
+            return table if table in scanned and column in columns[table] else None
+        owners = [t for t in scanned if column in columns[t]]
+        return owners[0] if len(owners) == 1 else None
+
+    equality, ranges, expressions = {}, {}, {}
+    for qualifier, column in _EQ_RE.findall(where):
+        table = _resolve(qualifier, column)
+        if table and column not in equality.setdefault(table, []):
+            equality[table].append(column)
+    for qualifier, column in _RANGE_RE.findall(where):
+        table = _resolve(qualifier, column)
+        if table and column not in equality.get(table, []):
+            ranges.setdefault(table, []).append(column)
+    for func, args in _EXPR_RE.findall(where):
+        referenced = [
+            _resolve(q, c) for q, c in re.findall(r"(?:(\w+)\.)?([A-Za-z_]\w*)", args)
+        ]
+        owners = {t for t in referenced if t}
+        if len(owners) == 1:
+            table = owners.pop()
+            # Drop alias qualifiers: index expressions reference bare columns
+            for alias in aliases:
+                args = re.sub(rf"\b{alias}\.(?=[A-Za-z_])", "", args)
+            expressions.setdefault(table, []).append(f"{func}({args.strip()})")
+
+    proposals = []
+    for table in sorted(scanned):
+        existing = _indexed_prefixes(conn, table)
+        key = (equality.get(table, []) + ranges.get(table, [])[:1])[:MAX_INDEX_COLUMNS]
+        if key and tuple(key) not in existing:
+            name = f"idx_auto_{table}_{'_'.join(key)}"[:60]
+            columns = ", ".join(key)
+            proposals.append({
+                "table": table,
+                "name": name,
+                "ddl": f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})",
+            })
+        for expr in expressions.get(table, []):
+            slug = re.sub(r"\W+", "_", expr.lower()).strip("_")
+            name = f"idx_auto_{table}_{slug}"[:60]
+            proposals.append({
+                "table": table,
+                "name": name,
+                "ddl": f"CREATE INDEX IF NOT EXISTS {name} ON {table}({expr})",
+            })
+    return proposals
+
+
+def hot_json_paths(min_uses: int = 5) -> dict[str, dict[str, str]]:
+    """
+    Finds raw_data JSON paths that logged queries extract often enough to be
+    worth promoting. Returns {table: {column_name: path}} ready for
+    DatabaseManager.promote_json_fields.
+    """
+    db_manager = DatabaseManager()
+    conn = db_manager.get_connection()
+    try:
+        columns = _table_columns(conn)
+        generated = {
+            (table, row[1])
+            for table in columns
+            for row in conn.execute(f"PRAGMA table_xinfo({table})")
+            if row[6] in (2, 3)  # hidden: 2 = virtual, 3 = stored generated
+        }
+    finally:
+        conn.close()
+
+    uses = {}
+    for sql, calls in QueryLog().samples():
+        aliases = {}
+        for table, alias in _TABLE_REF_RE.findall(sql):
+            if "raw_data" in columns.get(table, ()):
+                aliases[table] = table
+                if alias:
+                    aliases[alias] = table
+        for qualifier, path in _JSON_FIELD_RE.findall(sql):
+            if qualifier in aliases:
+                tables = {aliases[qualifier]}
+            else:
+                tables = set(aliases.values())
+            if len(tables) == 1:
+                key = (tables.pop(), path)
+                uses[key] = uses.get(key, 0) + calls
+
+    promotions = {}
+    for (table, path), count in uses.items():
+        if count < min_uses:
+            continue
+        column = re.sub(r"\W+", "_", path.lstrip("$.")).strip("_").lower()
+        if column in columns[table] and (table, column) not in generated:
+            # Avoid clashing with a typed column loaded by the collectors
+            column = f"raw_{column}"
+        promotions.setdefault(table, {})[column] = path
+    return promotions
+
+
+def advise(
+    min_avg_ms: float = 50, min_calls: int = 1, apply: bool = False
+) -> list[dict]:
+    """
+    Groups slow query shapes from the workload log and evaluates index
+    candidates for each one. Candidates are created inside a transaction,
+    timed, and rolled back unless `apply` is set.
+
+    Published generations are read-only, so the evaluation runs on a new
+    generation: published when indexes were applied, discarded otherwise.
+    """
+    db_manager = DatabaseManager()
+    shapes = QueryLog().slow_shapes(min_avg_ms=min_avg_ms, min_calls=min_calls)
+    logger.info(f"Found {len(shapes)} slow query shapes (avg >= {min_avg_ms}ms).")
+    if not shapes:
+        return []
+
+    generation = db_manager.create_generation()
+    try:
+        report = _evaluate(generation, shapes, apply)
+        if apply and report:
+            db_manager.publish_generation(generation)
+        else:
+            db_manager.discard_generation(generation)
+    except BaseException:
+        db_manager.discard_generation(generation)
+        raise
+    return report
+
+
+def _evaluate(
+    generation: DatabaseManager, shapes: list[dict], apply: bool
+) -> list[dict]:
+    conn = generation.get_connection()
+    conn.isolation_level = None  # Explicit transactions (DDL is transactional)
+    report = []
+    try:
+        for shape in shapes:
+            sql = shape["sample_sql"]
+            try:
+                proposals = propose_indexes(conn, sql)
+            except sqlite3.Error as e:
+                logger.warning(f"Skipping shape {shape['shape_hash']}: {e}")
+                continue
+            if not proposals:
+                continue
+
+            before_ms = _median_ms(conn, sql)
+            conn.execute("BEGIN")
+            try:
+                for proposal in proposals:
+                    conn.execute(proposal["ddl"])
+                after_ms = _median_ms(conn, sql)
+                conn.execute("COMMIT" if apply else "ROLLBACK")
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK")
+                logger.warning(
+                    f"Index evaluation failed for {shape['shape_hash']}: {e}"
+                )
+                continue
+
+            entry = {
+                "shape_hash": shape["shape_hash"],
+                "normalized_sql": shape["normalized_sql"],
+                "calls": shape["calls"],
+                "logged_avg_ms": round(shape["avg_ms"], 2),
+                "before_ms": round(before_ms, 2),
+                "after_ms": round(after_ms, 2),
+                "indexes": [p["ddl"] for p in proposals],
+                "applied": apply,
+            }
+            report.append(entry)
+    finally:
+        conn.close()
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(description="CivicAudit Index Advisor")
+    parser.add_argument(
+        "--min-avg-ms", type=float, default=50, help="Slow shape threshold (ms)"
+    )
+    parser.add_argument(
+        "--min-calls", type=int, default=1, help="Minimum executions per shape"
+    )
+    parser.add_argument(
+        "--apply", action="store_true", help="Create the proposed indexes"
+    )
+    parser.add_argument(
+        "--promote",
+        action="store_true",
+        help="Promote hot raw_data JSON paths to indexed generated columns",
+    )
+    parser.add_argument(
+        "--min-uses", type=int, default=5, help="Executions needed to promote a path"
+    )
+    args = parser.parse_args()
+
+    if args.promote:
+        promotions = hot_json_paths(args.min_uses)
+        created = []
+        if promotions:
+            with DatabaseManager().new_generation() as generation:
+                created = generation.promote_json_fields(promotions)
+        for name in created:
+            table, column = name.split(".", 1)
+            path = promotions[table][column]
+            print(f"[PROMOTED] {name} = json_extract(raw_data, '{path}')")
+        if not created:
+            print("No new raw_data fields to promote.")
+
+    for item in advise(args.min_avg_ms, args.min_calls, args.apply):
+        status = "APPLIED" if item["applied"] else "PROPOSED"
+        print(f"[{status}] {item['normalized_sql']}")
+        print(
+            f"  calls={item['calls']} logged_avg={item['logged_avg_ms']}ms "
+            f"before={item['before_ms']}ms after={item['after_ms']}ms"
+        )
+        for ddl in item["indexes"]:
+            print(f"  {ddl};")
@@ -1,31 +1,440 @@
 import logging
+import os
+import re
 import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: pins only protect generations in-process
+    fcntl = None
 
 from src.config import get_settings
+from src.etl.query_log import QueryLog
 
 logger = logging.getLogger(__name__)
 
+# Columns profiled into the value catalog at the end of each ETL run.
+# Categorical columns get their distinct values and frequencies, numeric
+# and date (ISO text) columns only their min/max range.
+CATALOG_COLUMNS = {
+    "despesas": {
+        "categorical": [
+            "exercicio_orcamento",
+            "mes_referencia",
+            "codigo_orgao",
+            "codigo_funcao",
+            "codigo_subfuncao",
+            "codigo_programa",
+            "codigo_elemento_despesa",
+        ],
+        "numeric": ["valor_empenhado", "valor_liquidado", "valor_pago"],
+    },
+    "licitacoes": {
+        "categorical": [
+            "exercicio_orcamento",
+            "modalidade_licitacao",
+            "situacao_licitacao",
+        ],
+        "numeric": ["valor_estimado"],
+        "date": ["data_realizacao_licitacao"],
+    },
+    "receitas": {
+        "categorical": [
+            "exercicio_orcamento",
+            "mes_referencia",
+            "codigo_receita",
+            "descricao_receita",
+        ],
+        "numeric": ["valor_orcado", "valor_arrecadado"],
+    },
+}
+
+# Max distinct values stored per categorical column (most frequent first)
+CATALOG_MAX_VALUES = 500
+
+# SQLite VM instructions between progress callbacks (query log accounting)
+VM_STEP_GRANULARITY = 100
+
+# Tables a database generation must contain before it can be published
+REQUIRED_TABLES = ["licitacoes", "despesas", "receitas", "etl_metadata"]
+GENERATION_POINTER = "CURRENT"
+# Superseded generations are kept at least this long for in-flight readers
+DEFAULT_GENERATION_GRACE_SECONDS = 600
+
+# Generation pinned for the current request / run (see pin_generation)
+_pinned_generation: ContextVar[Optional[str]] = ContextVar(
+    "pinned_generation", default=None
+)
+# In-process pin counts; other processes are seen through their flock()
+_pins: Dict[str, int] = {}
+_pins_lock = threading.Lock()
+
+# Matches DDL mapping comments such as "-- 10: Saúde"
+_DDL_LABEL_RE = re.compile(r"^\s*--\s*(\w+)\s*:\s*(.+?)\s*$")
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+_GENERATION_RE = re.compile(r"^gen_\w+\.db$")
+# raw_data JSON paths that can be promoted (shared with the index advisor)
+JSON_PATH_PATTERN = r"\$(?:\.\w+|\[\d+\])+"
+_JSON_PATH_RE = re.compile(rf"^{JSON_PATH_PATTERN}$")
+_DDL_COLUMN_RE = re.compile(r"^\s*(\w+)\s+(TEXT|REAL|INTEGER|JSON|DATETIME)\b", re.I)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases and strips accents (e.g. 'Saúde' -> 'saude')."""
+    if not text:
+        return ""
+    return "".join(
+        c for c in unicodedata.normalize("NFD", text)
+        if unicodedata.category(c) != "Mn"
+    ).lower()
+
+
+def parse_ddl_labels(ddl: str) -> dict[str, dict[str, str]]:
+    """
+    Extracts code mappings documented in DDL comments.
+    Returns {column: {code: label}} for blocks like:
+        codigo_funcao TEXT, -- Functional classification
+        -- 10: Saúde
+    """
+    labels: dict[str, dict[str, str]] = {}
+    current = None
+    for line in (ddl or "").splitlines():
+        col_match = _DDL_COLUMN_RE.match(line)
+        if col_match:
+            current = col_match.group(1)
+            continue
+        label_match = _DDL_LABEL_RE.match(line)
+        if current and label_match:
+            labels.setdefault(current, {})[label_match.group(1)] = label_match.group(2)
+    return labels
+
+
+def _connect(path: str, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        # mode=ro never creates the file: a generation pruned under a reader
+        # fails loudly instead of reappearing as an empty database
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return sqlite3.connect(path)
+
 
 class DatabaseManager:
-    def __init__(self):
+    """
+    Access to the audit database.
+
+    The database is laid out in generations: each ETL run writes a fresh
+    snapshot under `database.generations_dir` and atomically publishes it by
+    swapping the CURRENT pointer file. Readers resolve the pointer when they
+    open a connection, so they never see a half-loaded snapshot nor wait on
+    ETL write locks. Published generations are opened read-only and never
+    changed in place: maintenance writes go through `new_generation`.
+    Without a published generation, `database.path` is used.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
         settings = get_settings()
         try:
-            self.db_path = settings["database"]["path"]
+            self.base_path = settings["database"]["path"]
         except KeyError as e:
             raise ValueError("Missing 'database.path' in config.yaml") from e
+
+        db_settings = settings["database"]
+        self.generations_dir = db_settings.get(
+            "generations_dir",
+            os.path.join(os.path.dirname(self.base_path), "generations"),
+        )
+        self.keep_generations = db_settings.get("keep_generations", 3)
+        self.grace_seconds = db_settings.get(
+            "generation_grace_seconds", DEFAULT_GENERATION_GRACE_SECONDS
+        )
+        self.pointer_path = os.path.join(self.generations_dir, GENERATION_POINTER)
+
+        # A manager built with an explicit path is bound to that file (a
+        # generation being written, see create_generation)
+        self._pinned_path = db_path
+        self._pointer_cache = None
         self._setup_directories()
+        self.query_log = QueryLog()
 
     def _setup_directories(self):
-        import os
-
-        db_dir = os.path.dirname(self.db_path)
+        db_dir = os.path.dirname(self.base_path)
         if db_dir:
             Path(db_dir).mkdir(parents=True, exist_ok=True)
+        Path(self.generations_dir).mkdir(parents=True, exist_ok=True)
         Path("logs").mkdir(parents=True, exist_ok=True)
 
+    def _resolve(self) -> Tuple[str, bool]:
+        """(path, read_only): published generations are opened read-only."""
+        if self._pinned_path:
+            return self._pinned_path, False
+        generation = self.current_generation()
+        if generation:
+            return os.path.join(self.generations_dir, generation), True
+        return self.base_path, False
+
+    @property
+    def db_path(self) -> str:
+        return self._resolve()[0]
+
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        path, read_only = self._resolve()
+        return _connect(path, read_only)
+
+    # --- GENERATIONS ---
+
+    def current_generation(self) -> Optional[str]:
+        """
+        Name of the generation readers use: the one pinned for the current
+        request, else the published one (None for the legacy single file).
+        The pointer is re-read only when the file changes.
+        """
+        pinned = _pinned_generation.get()
+        if pinned:
+            return pinned
+        return self.published_generation()
+
+    def published_generation(self) -> Optional[str]:
+        """Name of the generation the CURRENT pointer designates."""
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+
+        key = (stat.st_ino, stat.st_mtime_ns)
+        if self._pointer_cache and self._pointer_cache[0] == key:
+            return self._pointer_cache[1]
+
+        with open(self.pointer_path, "r") as f:
+            generation = f.read().strip() or None
+        self._pointer_cache = (key, generation)
+        return generation
+
+    def data_version(self) -> str:
+        """Identifies the data readers currently see (for cache keys)."""
+        generation = self.current_generation()
+        if generation:
+            return generation
+        try:
+            return f"legacy-{os.stat(self.base_path).st_mtime_ns}"
+        except FileNotFoundError:
+            return "empty"
+
+    @contextmanager
+    def pin_generation(
+        self, generation: Optional[str] = None
+    ) -> Iterator[Optional[str]]:
+        """
+        Pins `generation` (default: the one published right now) for the
+        current context, so every read of one request / run agrees: managers
+        resolve to it and it is not pruned until the block exits. Yields
+        the pinned name (None for the legacy single file).
+        """
+        if generation and not (
+            _GENERATION_RE.match(generation)
+            and os.path.exists(os.path.join(self.generations_dir, generation))
+        ):
+            logger.warning(
+                f"Generation {generation!r} not found; using the published one."
+            )
+            generation = None
+        generation = generation or self.current_generation()
+        if not generation:
+            yield None
+            return
+
+        lock = None
+        if fcntl:
+            try:
+                lock = open(os.path.join(self.generations_dir, generation), "rb")
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            except OSError:
+                lock = None
+        with _pins_lock:
+            _pins[generation] = _pins.get(generation, 0) + 1
+        token = _pinned_generation.set(generation)
+        try:
+            yield generation
+        finally:
+            _pinned_generation.reset(token)
+            with _pins_lock:
+                _pins[generation] -= 1
+                if not _pins[generation]:
+                    del _pins[generation]
+            if lock:
+                lock.close()
+
+    def create_generation(self) -> "DatabaseManager":
+        """
+        Starts a new generation as a consistent copy of the current data and
+        returns a manager bound to it. Nothing is visible to readers until
+        `publish_generation` is called.
+        """
+        name = f"gen_{datetime.now():%Y%m%d%H%M%S%f}_{uuid.uuid4().hex[:6]}.db"
+        path = os.path.join(self.generations_dir, name)
+
+        source_path, read_only = self._resolve()
+        try:
+            target = sqlite3.connect(path)
+            try:
+                if os.path.exists(source_path):
+                    source = _connect(source_path, read_only)
+                    try:
+                        source.backup(target)
+                    finally:
+                        source.close()
+            finally:
+                target.close()
+        except BaseException:
+            self._remove_generation(name)
+            raise
+
+        logger.info(f"Created database generation {name} (from {source_path}).")
+        return DatabaseManager(db_path=path)
+
+    def discard_generation(self, generation: "DatabaseManager"):
+        """Removes an unpublished generation (failed run)."""
+        name = os.path.basename(generation.db_path)
+        if name == self.published_generation():
+            return
+        self._remove_generation(name)
+        logger.info(f"Discarded database generation {name}.")
+
+    @contextmanager
+    def new_generation(self) -> Iterator["DatabaseManager"]:
+        """
+        Copy-on-write change of the data: yields a new generation (copy of
+        the current one) to write to, published when the block succeeds and
+        discarded when it fails.
+        """
+        generation = self.create_generation()
+        try:
+            yield generation
+            self.publish_generation(generation)
+        except BaseException:
+            self.discard_generation(generation)
+            raise
+
+    def validate_generation(self, generation: "DatabaseManager"):
+        """
+        Raises ValueError if a generation is unfit to publish: integrity check
+        failure, missing tables, or main tables that lost rows compared to the
+        currently published data.
+        """
+        conn = sqlite3.connect(generation.db_path)
+        try:
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"Integrity check failed: {check}")
+
+            tables = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table'"
+                )
+            }
+            missing = [t for t in REQUIRED_TABLES if t not in tables]
+            if missing:
+                raise ValueError(f"Missing tables: {missing}")
+
+            new_counts = {
+                t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in REQUIRED_TABLES
+            }
+        finally:
+            conn.close()
+
+        current_path, read_only = self._resolve()
+        if os.path.exists(current_path):
+            current = _connect(current_path, read_only)
+            try:
+                for table, count in new_counts.items():
+                    try:
+                        old = current.execute(
+                            f"SELECT COUNT(*) FROM {table}"
+                        ).fetchone()[0]
+                    except sqlite3.OperationalError:
+                        continue
+                    if count < old:
+                        raise ValueError(
+                            f"Table '{table}' shrank from {old} to {count} rows"
+                        )
+            finally:
+                current.close()
+
+    def publish_generation(self, generation: "DatabaseManager"):
+        """
+        Validates a generation and atomically points readers to it.
+        Older generations beyond `database.keep_generations` are removed
+        once unpinned and superseded for `database.generation_grace_seconds`.
+        """
+        self.validate_generation(generation)
+        name = os.path.basename(generation.db_path)
+
+        tmp_path = f"{self.pointer_path}.{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+
+        logger.info(f"Published database generation {name}.")
+        self._prune_generations(current=name)
+
+    def _prune_generations(self, current: str):
+        generations = sorted(
+            f for f in os.listdir(self.generations_dir)
+            if f.startswith("gen_") and f.endswith(".db")
+        )
+        keep = set(generations[-self.keep_generations:]) | {current}
+        now = time.time()
+        for i, name in enumerate(generations[:-1]):
+            if name in keep or self._is_pinned(name):
+                continue
+            # Superseded when the next generation was written: readers that
+            # resolved the pointer just before may not have connected yet
+            try:
+                superseded_at = os.stat(
+                    os.path.join(self.generations_dir, generations[i + 1])
+                ).st_mtime
+            except FileNotFoundError:
+                superseded_at = now
+            if now - superseded_at < self.grace_seconds:
+                continue
+            # Readers still holding the file open keep working (POSIX unlink)
+            self._remove_generation(name)
+            logger.info(f"Removed old database generation {name}.")
+
+    def _is_pinned(self, name: str) -> bool:
+        with _pins_lock:
+            if _pins.get(name):
+                return True
+        if not fcntl:
+            return False
+        try:
+            with open(os.path.join(self.generations_dir, name), "rb") as f:
+                # Shared locks held by pin_generation in other processes
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def _remove_generation(self, name: str):
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            try:
+                os.remove(os.path.join(self.generations_dir, name + suffix))
+            except FileNotFoundError:
+                pass
 
     def initialize_schema(self):
         conn = self.get_connection()
@@ -140,21 +549,139 @@ class DatabaseManager:
             )
         """)
 
+        # Table: Column Catalog (Discovery)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS column_catalog (
+                table_name TEXT,
+                column_name TEXT,
+                kind TEXT, -- 'categorical', 'numeric' or 'date'
+                row_count INTEGER,
+                null_count INTEGER,
+                distinct_count INTEGER,
+                min_value,
+                max_value,
+                refreshed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_name, column_name)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS column_catalog_values (
+                table_name TEXT,
+                column_name TEXT,
+                value TEXT,
+                label TEXT, -- Human label from DDL comments (e.g. 'Saúde')
+                frequency INTEGER,
+                PRIMARY KEY (table_name, column_name, value)
+            )
+        """)
+
         conn.commit()
         conn.close()
 
-    def execute_query(self, query: str) -> list[dict]:
+        # Hot raw_data fields promoted to indexed generated columns
+        promoted = get_settings().get("database", {}).get("promoted_fields") or {}
+        self.promote_json_fields(promoted)
+
+    def promote_json_fields(self, fields: dict[str, dict[str, str]]) -> list[str]:
+        """
+        Promotes raw_data JSON paths into indexed generated columns so filters
+        on them run inside SQLite, e.g. {"licitacoes": {"data_autuacao":
+        "$.data_realizacao_autuacao_licitacao"}}. Idempotent.
+        Returns the columns created in this call.
+
+        SQLite only allows VIRTUAL generated columns in ALTER TABLE; the index
+        over the column stores the extracted values, which is what filters use.
+        """
+        created = []
         conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for table, columns in fields.items():
+                if not _IDENTIFIER_RE.match(table):
+                    logger.warning(f"Skipping promotion: invalid table name {table!r}")
+                    continue
+                existing = {
+                    row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})")
+                }
+                if not existing:
+                    logger.warning(f"Cannot promote fields: table '{table}' not found.")
+                    continue
+
+                for column, path in columns.items():
+                    # Bad entries are skipped one at a time, not the batch
+                    if not _IDENTIFIER_RE.match(column):
+                        logger.warning(
+                            f"Skipping promotion: invalid column name {column!r}"
+                        )
+                        continue
+                    if not _JSON_PATH_RE.match(path):
+                        logger.warning(
+                            f"Skipping promotion of {table}.{column}: "
+                            f"invalid JSON path {path!r}"
+                        )
+                        continue
+
+                    if column not in existing:
+                        cursor.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column} "
+                            "GENERATED ALWAYS AS "
+                            f"(json_extract(raw_data, '{path}')) VIRTUAL"
+                        )
+                        created.append(f"{table}.{column}")
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_gen_{table}_{column} "
+                        f"ON {table}({column})"
+                    )
+            conn.commit()
+        finally:
+            conn.close()
+
+        if created:
+            logger.info(f"Promoted raw_data fields: {created}")
+        return created
+
+    def execute_query(self, query: str, log: bool = True) -> list[dict]:
+        db_path, read_only = self._resolve()
+        conn = _connect(db_path, read_only)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
+
+        # Count VM work while the statement runs (scan cost proxy); only for
+        # the sampled queries that go to the query log
+        log = log and self.query_log.sampled()
+        vm_ticks = [0]
+
+        def _tick():
+            vm_ticks[0] += 1
+            return 0
+
+        if log:
+            conn.set_progress_handler(_tick, VM_STEP_GRANULARITY)
+
+        start_time = time.perf_counter()
+        rows = None
+        error = None
         try:
             cursor.execute(query)
             # return as list of dicts
-            return [dict(row) for row in cursor.fetchall()]
-        except Exception:
+            rows = [dict(row) for row in cursor.fetchall()]
+            return rows
+        except Exception as e:
+            error = str(e)
             raise
         finally:
+            duration_ms = (time.perf_counter() - start_time) * 1000
             conn.close()
+            if log:
+                # Queued; the plan is read by the log writer, off this path
+                self.query_log.record(
+                    query,
+                    duration_ms,
+                    rows_returned=len(rows) if rows is not None else None,
+                    vm_steps=vm_ticks[0] * VM_STEP_GRANULARITY,
+                    db_path=db_path,
+                    error=error,
+                )
 
     def get_all_tables(self) -> list[str]:
         conn = self.get_connection()
@@ -179,16 +706,6 @@ class DatabaseManager:
         return schema
 
     def search_schema(self, keyword: str) -> dict[str, str]:
-        import unicodedata
-
-        def normalize_text(text: str) -> str:
-            if not text:
-                return ""
-            return "".join(
-                c for c in unicodedata.normalize("NFD", text)
-                if unicodedata.category(c) != "Mn"
-            ).lower()
-
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -208,3 +725,143 @@ class DatabaseManager:
                 results[name] = sql
                 
         return results
+
+    def refresh_column_catalog(self) -> int:
+        """
+        Rebuilds the column value catalog (distinct values, frequencies and
+        min/max ranges) for CATALOG_COLUMNS. Meant to run once at the end of
+        each ETL cycle so agents can discover codes without scanning tables.
+        Returns the number of profiled columns.
+        """
+        existing = set(self.get_all_tables())
+        schema = self.get_start_schema()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        profiled = 0
+        try:
+            cursor.execute("DELETE FROM column_catalog")
+            cursor.execute("DELETE FROM column_catalog_values")
+
+            for table, kinds in CATALOG_COLUMNS.items():
+                if table not in existing:
+                    continue
+                labels = parse_ddl_labels(schema.get(table, ""))
+                row_count = cursor.execute(
+                    f"SELECT COUNT(*) FROM {table}"
+                ).fetchone()[0]
+
+                for kind in ("categorical", "numeric", "date"):
+                    for column in kinds.get(kind, []):
+                        null_count, distinct_count, min_value, max_value = (
+                            cursor.execute(
+                                f"SELECT SUM({column} IS NULL), "
+                                f"COUNT(DISTINCT {column}), "
+                                f"MIN({column}), MAX({column}) FROM {table}"
+                            ).fetchone()
+                        )
+                        cursor.execute(
+                            """
+                            INSERT INTO column_catalog (
+                                table_name, column_name, kind, row_count,
+                                null_count, distinct_count, min_value, max_value
+                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                            """,
+                            (
+                                table, column, kind, row_count, null_count or 0,
+                                distinct_count, min_value, max_value,
+                            ),
+                        )
+
+                        if kind == "categorical":
+                            column_labels = labels.get(column, {})
+                            rows = cursor.execute(
+                                f"SELECT {column}, COUNT(*) AS freq FROM {table} "
+                                f"WHERE {column} IS NOT NULL "
+                                f"GROUP BY {column} ORDER BY freq DESC LIMIT ?",
+                                (CATALOG_MAX_VALUES,),
+                            ).fetchall()
+                            cursor.executemany(
+                                """
+                                INSERT INTO column_catalog_values (
+                                    table_name, column_name, value, label, frequency
+                                ) VALUES (?, ?, ?, ?, ?)
+                                """,
+                                [
+                                    (
+                                        table, column, str(value),
+                                        column_labels.get(str(value)), freq,
+                                    )
+                                    for value, freq in rows
+                                ],
+                            )
+                        profiled += 1
+
+            conn.commit()
+        finally:
+            conn.close()
+
+        logger.info(f"Column catalog refreshed ({profiled} columns).")
+        return profiled
+
+    def get_column_catalog(
+        self, table_name: str = None, column_name: str = None
+    ) -> list[dict]:
+        """
+        Reads the precomputed catalog. Each entry describes one column and,
+        for categorical columns, carries its known values ordered by frequency.
+        """
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        try:
+            query = "SELECT * FROM column_catalog WHERE 1=1"
+            params = []
+            if table_name:
+                query += " AND table_name = ?"
+                params.append(table_name)
+            if column_name:
+                query += " AND column_name = ?"
+                params.append(column_name)
+            columns = [dict(row) for row in cursor.execute(query, params)]
+
+            for entry in columns:
+                entry.pop("refreshed_at", None)
+                if entry["kind"] != "categorical":
+                    continue
+                entry["values"] = [
+                    dict(row)
+                    for row in cursor.execute(
+                        """
+                        SELECT value, label, frequency FROM column_catalog_values
+                        WHERE table_name = ? AND column_name = ?
+                        ORDER BY frequency DESC
+                        """,
+                        (entry["table_name"], entry["column_name"]),
+                    )
+                ]
+            return columns
+        except sqlite3.OperationalError:
+            # Catalog not built yet (schema predates it or ETL never ran)
+            return []
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(description="CivicAudit database maintenance")
+    parser.add_argument("command", choices=["init-schema", "refresh-catalog"])
+    args = parser.parse_args()
+
+    # Published generations are read-only: changes go to a new generation
+    with DatabaseManager().new_generation() as generation:
+        if args.command == "init-schema":
+            generation.initialize_schema()
+            print("Database schema initialized!")
+        else:
+            generation.refresh_column_catalog()
+            print("Column catalog refreshed!")
@@ -120,8 +120,19 @@ def run_etl(municipality_id=None, manual_year=None):
     logger.info(f"Sources: {data_sources}")
 
     # 2. Infra Init
+    # Writes go to a new database generation; readers keep using the
+    # published one until the run is validated and swapped in (end of the
+    # block); a failed run discards its generation.
     db_manager = DatabaseManager()
-    db_manager.initialize_schema()
+    with db_manager.new_generation() as generation:
+        _collect(generation, municipality_id, years, data_sources)
+
+    logger.info("Batch Collection Cycle Finished.")
+
+
+def _collect(generation, municipality_id, years, data_sources):
+    """Loads every (year, source) pair into `generation` (steps 2-5 of run_etl)."""
+    generation.initialize_schema()
     client = TCEClient()
 
     # 3. Collector Map
@@ -133,9 +144,9 @@ def run_etl(municipality_id=None, manual_year=None):
     # from .collectors.notas import InvoicesCollector
 
     collector_map = {
-        "licitacoes": TendersCollector(db_manager, client),
-        "despesas": ExpensesCollector(db_manager, client),
-        "receitas": RevenueCollector(db_manager, client),
+        "licitacoes": TendersCollector(generation, client),
+        "despesas": ExpensesCollector(generation, client),
+        "receitas": RevenueCollector(generation, client),
         # Assuming Contratos/Notas are stable now, add them if imported
         # "contratos": ContractsCollector(db_manager, client),
         # "notas_fiscais": InvoicesCollector(db_manager, client)
@@ -157,7 +168,7 @@ def run_etl(municipality_id=None, manual_year=None):
                 tasks.append(
                     executor.submit(
                         process_task, 
-                        db_manager, 
+                        generation, 
                         client, 
                         municipality_id, 
                         year, 
@@ -171,7 +182,8 @@ def run_etl(municipality_id=None, manual_year=None):
             result = future.result()
             logger.info(result)
 
-    logger.info("Batch Collection Cycle Finished.")
+    # 5. Refresh discovery catalog (distinct values / ranges per column)
+    generation.refresh_column_catalog()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+import atexit
+import hashlib
+import logging
+import queue
+import random
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Rows kept in the log; older entries are pruned periodically
+DEFAULT_MAX_ROWS = 100_000
+PRUNE_EVERY = 1000
+# Pending records buffered for the background writer; extra ones are dropped
+QUEUE_SIZE = 10_000
+# Records inserted per transaction by the background writer
+BATCH_SIZE = 200
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST_RE = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Reduces a query to its shape: literals become '?', comments and extra
+    whitespace are dropped and IN lists collapse to a single placeholder.
+    """
+    shape = _COMMENT_RE.sub(" ", sql)
+    shape = _STRING_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _SPACE_RE.sub(" ", shape).strip().rstrip(";").strip().lower()
+    return _IN_LIST_RE.sub("in (?)", shape)
+
+
+def shape_hash(normalized_sql: str) -> str:
+    return hashlib.sha1(normalized_sql.encode("utf-8")).hexdigest()[:16]
+
+
+def _explain(db_path: str, sql: str) -> Optional[str]:
+    """EXPLAIN QUERY PLAN details, on a read-only connection to `db_path`."""
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=1)
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            return "; ".join(row[3] for row in plan)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+class _Writer:
+    """
+    Background thread owning the writes to one query log file: records are
+    queued by readers and inserted in batches, with the query plan computed
+    here rather than on the request path.
+    """
+
+    def __init__(self, log: "QueryLog"):
+        self.log = log
+        self.queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+        threading.Thread(target=self._run, name="query-log-writer", daemon=True).start()
+
+    def put(self, record: tuple):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.log._insert(batch)
+            except Exception as e:
+                logger.warning(f"Query log write failed: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self):
+        self.queue.join()
+
+
+_writers: Dict[str, _Writer] = {}
+_writers_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_writers():
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
+class QueryLog:
+    """
+    Workload log of SQL statements executed through `query_sql` (a sample
+    of them, `database.query_log_sample_rate`). Lives in its own SQLite
+    file and is written by a background thread, so logging never adds a
+    write to the request path nor contends with the audit database readers
+    (or the ETL writers).
+    """
+
+    def __init__(self):
+        settings = get_settings().get("database", {})
+        self.enabled = settings.get("query_log", True)
+        self.path = settings.get("query_log_path", "data/query_log.db")
+        self.max_rows = settings.get("query_log_max_rows", DEFAULT_MAX_ROWS)
+        self.sample_rate = settings.get("query_log_sample_rate", 1.0)
+        self._ready = False
+
+    def sampled(self) -> bool:
+        """Whether to log the next query (decided before running it)."""
+        return self.enabled and random.random() < self.sample_rate
+
+    def _writer(self) -> _Writer:
+        with _writers_lock:
+            if self.path not in _writers:
+                _writers[self.path] = _Writer(self)
+            return _writers[self.path]
+
+    def flush(self):
+        """Waits until queued records are written (CLI tools, tests)."""
+        with _writers_lock:
+            writer = _writers.get(self.path)
+        if writer:
+            writer.flush()
+
+    def get_connection(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        db_dir = Path(self.path).parent
+        db_dir.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    shape_hash TEXT,
+                    normalized_sql TEXT, -- literals replaced by '?'
+                    sample_sql TEXT, -- the exact statement executed
+                    duration_ms REAL,
+                    rows_returned INTEGER,
+                    vm_steps INTEGER, -- SQLite VM instructions (scan work proxy)
+                    query_plan TEXT, -- EXPLAIN QUERY PLAN details
+                    error TEXT,
+                    executed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_qlog_shape ON query_log(shape_hash)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self._ready = True
+
+    def record(
+        self,
+        sql: str,
+        duration_ms: float,
+        rows_returned: int = None,
+        vm_steps: int = None,
+        db_path: str = None,
+        error: str = None,
+    ):
+        """
+        Queues one execution for the background writer; the query plan is
+        read from `db_path` there. Best effort: logging never fails or
+        blocks a query (records are dropped when the queue is full).
+        """
+        if not self.enabled:
+            return
+        self._writer().put((sql, duration_ms, rows_returned, vm_steps, db_path, error))
+
+    def _insert(self, batch: list[tuple]):
+        self._ensure_schema()
+        rows = []
+        for sql, duration_ms, rows_returned, vm_steps, db_path, error in batch:
+            normalized = normalize_sql(sql)
+            query_plan = _explain(db_path, sql) if db_path and not error else None
+            rows.append((
+                shape_hash(normalized), normalized, sql, round(duration_ms, 3),
+                rows_returned, vm_steps, query_plan, error,
+            ))
+        conn = self.get_connection()
+        try:
+            before = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM query_log"
+            ).fetchone()[0]
+            conn.executemany(
+                """
+                INSERT INTO query_log (
+                    shape_hash, normalized_sql, sample_sql, duration_ms,
+                    rows_returned, vm_steps, query_plan, error
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            last_id = before + len(rows)
+            if last_id // PRUNE_EVERY != before // PRUNE_EVERY:
+                conn.execute(
+                    "DELETE FROM query_log WHERE id <= ?", (last_id - self.max_rows,)
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def slow_shapes(self, min_avg_ms: float = 50, min_calls: int = 1) -> list[dict]:
+        """
+        Groups logged executions by shape, slowest first.
+        Only successful executions count towards the timings.
+        """
+        self._ensure_schema()
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(
+                """
+                SELECT shape_hash,
+                       MAX(normalized_sql) AS normalized_sql,
+                       MAX(sample_sql) AS sample_sql,
+                       COUNT(*) AS calls,
+                       AVG(duration_ms) AS avg_ms,
+                       MAX(duration_ms) AS max_ms,
+                       SUM(duration_ms) AS total_ms,
+                       AVG(rows_returned) AS avg_rows,
+                       AVG(vm_steps) AS avg_vm_steps,
+                       MAX(query_plan) AS query_plan
+                FROM query_log
+                WHERE error IS NULL
+                GROUP BY shape_hash
+                HAVING AVG(duration_ms) >= ? AND COUNT(*) >= ?
+                ORDER BY total_ms DESC
+                """,
+                (min_avg_ms, min_calls),
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def samples(self) -> list[tuple[str, int]]:
+        """One sample statement per logged shape with its execution count."""
+        self._ensure_schema()
+        conn = self.get_connection()
+        try:
+            return conn.execute(
+                """
+                SELECT MAX(sample_sql), COUNT(*) FROM query_log
+                WHERE error IS NULL GROUP BY shape_hash
+                """
+            ).fetchall()
+        finally:
+            conn.close()
@@ -0,0 +1,241 @@
+"""
+Runs inside each SubprocessSandbox child before the script (copied next to
+it; standard library only, as the child has no access to the project).
+
+With isolation on, the child moves into new mount, network and PID
+namespaces (and a user namespace unless started as root) and gets its own
+root: read-only binds of the system directories and the Python
+installation, the writable work directory and, read-only, the MCP Unix
+socket and the data snapshot when given. Nothing else of the
+host filesystem (project, .env, data/, logs/) and no host /proc is visible;
+the network has only loopback, left down. Privileges are then dropped: to
+the dedicated `uid`/`gid` when started as root, otherwise every capability
+(the script keeps the agent's kernel uid but sees only that view). Finally
+rlimits are applied and the script runs as __main__.
+
+Done in the child interpreter rather than a preexec_fn, which is unsafe in
+the threaded agent process (and unshare(CLONE_NEWUSER) needs a
+single-threaded caller).
+
+Usage: python -s _bootstrap.py '<json config>' script.py
+"""
+
+import ctypes
+import json
+import os
+import resource
+import runpy
+import sys
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_NOATIME = 0x400
+MS_NODIRATIME = 0x800
+MS_BIND = 0x1000
+MS_MOVE = 0x2000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+
+# statvfs flags a read-only remount must keep (locked on inherited mounts)
+_KEPT_FLAGS = {
+    os.ST_NOEXEC: MS_NOEXEC,
+    os.ST_NOATIME: MS_NOATIME,
+    os.ST_NODIRATIME: MS_NODIRATIME,
+    os.ST_RELATIME: MS_RELATIME,
+}
+
+PR_SET_NO_NEW_PRIVS = 38
+_LINUX_CAPABILITY_VERSION_3 = 0x20080522
+
+SYSTEM_PATHS = ("/usr", "/bin", "/sbin", "/lib", "/lib32", "/lib64", "/etc")
+DEVICES = ("/dev/null", "/dev/zero", "/dev/random", "/dev/urandom")
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+class _CapHeader(ctypes.Structure):
+    _fields_ = [("version", ctypes.c_uint32), ("pid", ctypes.c_int)]
+
+
+class _CapData(ctypes.Structure):
+    _fields_ = [
+        ("effective", ctypes.c_uint32),
+        ("permitted", ctypes.c_uint32),
+        ("inheritable", ctypes.c_uint32),
+    ]
+
+
+def _check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _encode(value):
+    return value.encode() if value is not None else None
+
+
+def _mount(source, target, fstype, flags, data=None):
+    _check(
+        _libc.mount(
+            _encode(source),
+            _encode(target),
+            _encode(fstype),
+            ctypes.c_ulong(flags),
+            _encode(data),
+        ),
+        f"mount {target}",
+    )
+
+
+def _write(path, text):
+    with open(path, "w", buffering=1) as f:
+        f.write(text)
+
+
+def _mounts_under(path):
+    """Mount points at or below `path`, parents first."""
+    prefix = path.rstrip("/") + "/"
+    with open("/proc/self/mountinfo") as f:
+        points = [
+            line.split()[4].encode().decode("unicode_escape") for line in f
+        ]
+    return [p for p in points if p == path or p.startswith(prefix)]
+
+
+def _remount_readonly(path):
+    for point in _mounts_under(path):
+        flags = MS_BIND | MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV
+        current = os.statvfs(point).f_flag
+        for st_flag, ms_flag in _KEPT_FLAGS.items():
+            if current & st_flag:
+                flags |= ms_flag
+        _mount(None, point, None, flags)
+
+
+def _bind(root, path, writable=False):
+    target = root + path
+    if os.path.islink(path):
+        # e.g. /bin -> usr/bin on merged-/usr systems
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.lexists(target):
+            os.symlink(os.readlink(path), target)
+        return
+    if os.path.isdir(path):
+        os.makedirs(target, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        open(target, "a").close()
+    _mount(path, target, None, MS_BIND | MS_REC)
+    if not writable:
+        _remount_readonly(target)
+
+
+def _readonly_paths(config):
+    """System directories and the interpreter's prefixes, outermost only."""
+    paths = set(SYSTEM_PATHS)
+    for prefix in (sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix):
+        paths.add(os.path.abspath(prefix))
+    kept = []
+    for path in sorted(paths):
+        if not os.path.lexists(path):
+            continue
+        if any(path.startswith(parent.rstrip("/") + "/") for parent in kept):
+            continue
+        kept.append(path)
+    return kept + list(config["readonly"])
+
+
+def _drop_capabilities():
+    header = _CapHeader(_LINUX_CAPABILITY_VERSION_3, 0)
+    data = (_CapData * 2)()
+    _check(_libc.capset(ctypes.byref(header), data), "capset")
+
+
+def isolate(config):
+    """
+    Enters the sandbox namespaces, root and identity. Returns in the
+    sandboxed process (PID 1 of its namespace); the process that called it
+    only waits for that one and exits with its status.
+    """
+    uid, gid = config["uid"], config["gid"]
+    outer_uid, outer_gid = os.getuid(), os.getgid()
+
+    namespaces = CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWPID
+    if outer_uid == 0:
+        # Root needs no user namespace and switches to the dedicated ids below
+        _check(_libc.unshare(namespaces), "unshare")
+    else:
+        # A process can only map its own uid into the namespace it entered
+        _check(_libc.unshare(CLONE_NEWUSER | namespaces), "unshare")
+        _write("/proc/self/setgroups", "deny")
+        _write("/proc/self/uid_map", f"{uid} {outer_uid} 1\n")
+        _write("/proc/self/gid_map", f"{gid} {outer_gid} 1\n")
+
+    # The new PID namespace applies to children: the script runs in one
+    child = os.fork()
+    if child:
+        _, status = os.waitpid(child, 0)
+        code = os.waitstatus_to_exitcode(status)
+        os._exit(code if code >= 0 else 128 - code)
+
+    root = config["root"]
+    _mount(None, "/", None, MS_REC | MS_PRIVATE)
+    _mount("tmpfs", root, "tmpfs", MS_NOSUID | MS_NODEV, "mode=0755,size=1m")
+    for path in _readonly_paths(config):
+        _bind(root, path)
+    _bind(root, config["workdir"], writable=True)
+    for device in DEVICES:
+        if os.path.exists(device):
+            _bind(root, device, writable=True)
+    os.makedirs(root + "/proc")
+    try:
+        _mount("proc", root + "/proc", "proc", MS_NOSUID | MS_NODEV | MS_NOEXEC)
+    except OSError:
+        pass  # Not permitted under a masked host /proc: the script gets none
+    _mount(None, root, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+
+    os.chdir(root)
+    _mount(".", "/", None, MS_MOVE)
+    os.chroot(".")
+    os.chdir(config["workdir"])
+
+    if outer_uid == 0:
+        os.setgroups([])
+        os.setresgid(gid, gid, gid)
+        os.setresuid(uid, uid, uid)  # Clears every capability
+    else:
+        _drop_capabilities()
+    _check(_libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "prctl")
+
+
+def main():
+    config = json.loads(sys.argv[1])
+    if config["isolate"]:
+        try:
+            isolate(config)
+        except OSError as e:
+            sys.exit(f"Sandbox: could not isolate the script ({e})")
+    if config.get("probe"):
+        # Isolation check: the installation is readable, the workdir writable
+        import decimal  # noqa: F401
+
+        _write(os.path.join(config["workdir"], "probe"), "ok")
+        sys.exit(0)
+    for name, value in config["rlimits"].items():
+        resource.setrlimit(getattr(resource, name), (value, value))
+    sys.argv = [sys.argv[2]]
+    runpy.run_path(sys.argv[0], run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
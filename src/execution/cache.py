@@ -0,0 +1,141 @@
+import ast
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.config import get_settings
+from src.etl.database import DatabaseManager
+from src.execution.output import is_timeout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+# Failures caused by the environment rather than by code + data
+TRANSIENT_MARKERS = (
+    "RPC/Network Error",
+    "Could not connect to MCP Server",
+    "'code': -32001",  # Admission control rejections (src/mcp/admission.py)
+    "'code': -32002",
+    "'code': -32003",
+)
+
+
+def normalize_code(code: str) -> str:
+    """
+    Canonical form of a script: its AST dump, so formatting and comments do
+    not change the key. Falls back to stripped lines for invalid syntax.
+    """
+    try:
+        return ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        lines = (line.rstrip() for line in code.strip().splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+class ExecutionCache:
+    """
+    In-memory LRU + TTL cache of sandbox output, keyed by the normalized
+    script and the data version it ran against. A new ETL generation
+    changes the version, so stale results are never served.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        settings = get_settings().get("sandbox", {}).get("cache", {})
+        self.enabled = settings.get("enabled", True)
+        self.ttl_seconds = ttl_seconds or settings.get(
+            "ttl_seconds", DEFAULT_TTL_SECONDS
+        )
+        self.max_entries = max_entries or settings.get(
+            "max_entries", DEFAULT_MAX_ENTRIES
+        )
+        self.max_bytes = max_bytes or settings.get("max_bytes", DEFAULT_MAX_BYTES)
+
+        self.db_manager = DatabaseManager()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def key(self, code: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.db_manager.data_version().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalize_code(code).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, code: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = self.key(code)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            if entry:
+                self._remove(key)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, code: str, output: str):
+        """Stores a deterministic result (script output or script error)."""
+        if not self.enabled or not self.cacheable(output):
+            return
+        size = len(output.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        key = self.key(code)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (output, time.time(), size)
+            self._bytes += size
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    @staticmethod
+    def cacheable(output: str) -> bool:
+        if output.startswith("System Error") or is_timeout(output):
+            return False
+        return not any(marker in output for marker in TRANSIENT_MARKERS)
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_execution_cache() -> ExecutionCache:
+    """Process-wide execution cache shared by the execute nodes."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExecutionCache()
+        return _cache
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from src.config import get_settings
+from src.etl.database import DatabaseManager
+from src.execution.output import (
+    CappedOutput,
+    ExecutionResult,
+    build_result,
+    elapsed_ms,
+    sandbox_limits,
+    timeout_error,
+)
+
+logger = logging.getLogger(__name__)
+
+SHIM_PATH = os.path.join(os.path.dirname(__file__), "shim.py")
+
+DEFAULT_MAX_FILE_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_OPEN_FILES = 64
+
+# Copied next to the script: namespaces, private root, privilege drop and
+# rlimits, then runs the script (see bootstrap.py)
+BOOTSTRAP_PATH = os.path.join(os.path.dirname(__file__), "bootstrap.py")
+
+# When isolation is not permitted on this host: "docker" (switch backend),
+# "error" (refuse to start) or "rlimits" (run unisolated)
+DEFAULT_ISOLATION_FALLBACK = "docker"
+
+# Identity sandboxed scripts run as (nobody/nogroup by default)
+DEFAULT_UID = 65534
+DEFAULT_GID = 65534
+
+_isolation_supported: Dict[str, bool] = {}
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)b?\s*$", re.IGNORECASE)
+
+
+def _parse_bytes(value) -> int:
+    """'512m' / '2g' / 1048576 -> bytes (Docker-style sizes)."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " kmgt".index(unit.lower() or " "))
+
+
+def _prepare_workdir(uid: int, gid: int) -> str:
+    workdir = tempfile.mkdtemp(prefix="sandbox_")
+    shutil.copy(BOOTSTRAP_PATH, os.path.join(workdir, "_bootstrap.py"))
+    if os.geteuid() == 0:
+        # The script runs as the dedicated uid and writes here
+        os.chown(workdir, uid, gid)
+    return workdir
+
+
+def isolation_supported(python: str, uid: int, gid: int) -> bool:
+    """
+    Whether `python` can build the sandbox (namespaces, private root,
+    privilege drop); checked once per interpreter by running the bootstrap
+    in probe mode in a throwaway child, and cached.
+    """
+    if python not in _isolation_supported:
+        workdir = _prepare_workdir(uid, gid)
+        root = tempfile.mkdtemp(prefix="sandbox_root_")
+        config = {
+            "isolate": True,
+            "probe": True,
+            "root": root,
+            "workdir": workdir,
+            "readonly": [],
+            "uid": uid,
+            "gid": gid,
+        }
+        try:
+            probe = subprocess.run(
+                [python, "-s", "_bootstrap.py", json.dumps(config)],
+                cwd=workdir,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=10,
+            )
+            _isolation_supported[python] = probe.returncode == 0 and os.path.exists(
+                os.path.join(workdir, "probe")
+            )
+            if not _isolation_supported[python]:
+                logger.debug(f"Sandbox isolation probe failed: {probe.stderr!r}")
+        except (OSError, subprocess.SubprocessError):
+            _isolation_supported[python] = False
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            shutil.rmtree(root, ignore_errors=True)
+    return _isolation_supported[python]
+
+
+def _kill_session(pid: int):
+    # Background processes the script left behind
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class SubprocessSandbox:
+    """
+    Lightweight sandbox backend: each execution is a fresh Python subprocess
+    in a temporary directory, with CPU/memory/file-size/open-file rlimits
+    and a minimal environment. Isolated (the default), it runs in its own
+    namespaces and root: read-only system and Python directories, a writable
+    workdir only, no network besides the MCP Unix socket, as a dedicated
+    unprivileged identity (see bootstrap.py). Same `execute` contract as
+    DockerSandbox, no Docker daemon.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        sandbox_settings = self.settings.get("sandbox", {})
+        self.python = sandbox_settings.get("python") or sys.executable
+        self.memory_limit = _parse_bytes(sandbox_settings.get("memory_limit", "512m"))
+        self.cpu_seconds = sandbox_settings.get("cpu_seconds")
+        self.max_file_bytes = _parse_bytes(
+            sandbox_settings.get("max_file_bytes", DEFAULT_MAX_FILE_BYTES)
+        )
+        self.uid = int(sandbox_settings.get("uid", DEFAULT_UID))
+        self.gid = int(sandbox_settings.get("gid", DEFAULT_GID))
+        if not (self.uid and self.gid):
+            raise ValueError("sandbox.uid and sandbox.gid must not be 0 (root)")
+
+        self.isolate = sandbox_settings.get("isolate", True)
+        # Checked once here rather than failing every run
+        self.isolation_unavailable = bool(
+            self.isolate and not isolation_supported(self.python, self.uid, self.gid)
+        )
+        fallback = sandbox_settings.get(
+            "isolation_fallback", DEFAULT_ISOLATION_FALLBACK
+        )
+        if self.isolation_unavailable and fallback == "rlimits":
+            logger.warning(
+                "Sandbox: isolation unavailable (namespaces are not permitted "
+                "here); scripts run with rlimits only, with the agent's file and "
+                "network access (sandbox.isolation_fallback: rlimits)."
+            )
+            self.isolate = False
+
+    def _socket_path(self) -> Optional[str]:
+        socket_path = os.environ.get("MCP_SOCKET") or self.settings.get(
+            "mcp", {}
+        ).get("socket_path")
+        if not socket_path:
+            return None
+        socket_path = os.path.abspath(socket_path)
+        try:
+            if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                return socket_path
+        except OSError:
+            pass
+        return None
+
+    def _environment(self, workdir: str, socket_path: Optional[str]) -> dict:
+        env = {
+            "PATH": os.defpath,
+            "HOME": workdir,
+            "TMPDIR": workdir,
+            "LANG": "C.UTF-8",
+            "PYTHONDONTWRITEBYTECODE": "1",
+            "PYTHONUNBUFFERED": "1",
+            "MCP_HOST": os.environ.get("MCP_HOST", "127.0.0.1"),
+            "MCP_PORT": os.environ.get("MCP_PORT", "8000"),
+        }
+        if socket_path:
+            env["MCP_SOCKET"] = socket_path
+        db_manager = DatabaseManager()
+        generation = db_manager.current_generation()
+        if generation:
+            env["AUDIT_DB_GENERATION"] = generation
+        if self.settings.get("sandbox", {}).get("data_mode", "remote") == "local":
+            env["AUDIT_DB_PATH"] = os.path.abspath(db_manager.db_path)
+        return env
+
+    def _config(self, timeout: int, workdir: str, root: Optional[str], env: dict):
+        if self.isolate and "MCP_SOCKET" not in env:
+            # No network inside: TCP can't reach the server
+            raise RuntimeError(
+                "MCP Unix socket not available; isolated sandboxes need it "
+                "(mcp.socket_path or MCP_SOCKET)"
+            )
+        return {
+            "isolate": self.isolate,
+            "root": root,
+            "workdir": workdir,
+            # Bound read-only into the sandbox root
+            "readonly": [
+                env[name] for name in ("MCP_SOCKET", "AUDIT_DB_PATH") if name in env
+            ],
+            "uid": self.uid,
+            "gid": self.gid,
+            "rlimits": {
+                "RLIMIT_AS": self.memory_limit,
+                "RLIMIT_CPU": int(self.cpu_seconds or timeout),
+                "RLIMIT_FSIZE": self.max_file_bytes,
+                "RLIMIT_NOFILE": DEFAULT_MAX_OPEN_FILES,
+                "RLIMIT_CORE": 0,
+            },
+        }
+
+    def execute(self, code: str, timeout: Optional[int] = None) -> ExecutionResult:
+        """
+        Executes python code in a fresh subprocess inside a temporary directory.
+        The process group is killed after `timeout` seconds (default
+        `sandbox.timeout`); output is streamed and capped at
+        `sandbox.max_output_bytes`. CPU time and peak memory come from the
+        script's own rusage (stats["script"]).
+        """
+        timeout, max_output_bytes = sandbox_limits(timeout)
+        stats: Dict[str, Any] = {"backend": "subprocess"}
+        try:
+            started_at = time.perf_counter()
+            workdir = _prepare_workdir(self.uid, self.gid)
+            # Mount point of the sandbox's private root
+            root = tempfile.mkdtemp(prefix="sandbox_root_") if self.isolate else None
+            try:
+                shutil.copy(SHIM_PATH, os.path.join(workdir, "shim.py"))
+                with open(os.path.join(workdir, "script.py"), "w") as f:
+                    f.write("from shim import *\n\n" + code)
+
+                env = self._environment(workdir, self._socket_path())
+                config = self._config(timeout, workdir, root, env)
+                process = subprocess.Popen(
+                    [
+                        self.python,
+                        "-s",  # No user site-packages
+                        "_bootstrap.py",
+                        json.dumps(config),
+                        "script.py",
+                    ],
+                    cwd=workdir,
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+                stats["start_ms"] = elapsed_ms(started_at)
+
+                started_at = time.perf_counter()
+                output = CappedOutput(max_output_bytes)
+                reader = output.drain(iter(lambda: process.stdout.read1(65536), b""))
+                error = None
+                try:
+                    process.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    # The session also holds any children the script started
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait()
+                    error = timeout_error(timeout)
+                finally:
+                    _kill_session(process.pid)
+                reader.join(timeout=5)
+                stats["run_ms"] = elapsed_ms(started_at)
+
+            finally:
+                started_at = time.perf_counter()
+                shutil.rmtree(workdir, ignore_errors=True)
+                if root:
+                    shutil.rmtree(root, ignore_errors=True)
+                stats["teardown_ms"] = elapsed_ms(started_at)
+
+            return build_result(output, stats, error)
+
+        except Exception as e:
+            return ExecutionResult(f"System Error: {str(e)}", stats)
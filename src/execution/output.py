@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from src.config import get_settings
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_OUTPUT_BYTES = 32 * 1024
+
+# Share of the cap kept from the end of the output (tracebacks live there)
+TAIL_FRACTION = 0.25
+
+# Prefix of the line the shim writes to stderr at exit with its own usage
+# (MCP calls/bytes, CPU time, peak RSS); see src/execution/shim.py
+STATS_MARKER = "__SANDBOX_STATS__"
+
+
+class ExecutionResult(NamedTuple):
+    """Sandbox output plus resource accounting for the run."""
+
+    output: str
+    stats: Dict[str, Any]
+
+
+def split_stats(output: str) -> Tuple[str, Dict[str, Any]]:
+    """Removes the shim's stats line from the output and returns it parsed."""
+    marker_at = output.rfind(STATS_MARKER)
+    if marker_at == -1 or (marker_at and output[marker_at - 1] != "\n"):
+        return output, {}
+    line_end = output.find("\n", marker_at)
+    line_end = len(output) if line_end == -1 else line_end + 1
+    try:
+        stats = json.loads(output[marker_at + len(STATS_MARKER) : line_end])
+    except ValueError:
+        return output, {}
+    # The shim starts the line with its own newline
+    line_start = marker_at - 1 if marker_at else marker_at
+    return output[:line_start] + output[line_end:], stats
+
+
+def sandbox_limits(timeout: Optional[int] = None):
+    """(timeout seconds, max output bytes) from the call or `sandbox` config."""
+    settings = get_settings().get("sandbox", {})
+    return (
+        timeout or settings.get("timeout", DEFAULT_TIMEOUT),
+        settings.get("max_output_bytes", DEFAULT_MAX_OUTPUT_BYTES),
+    )
+
+
+TIMEOUT_ERROR_SUFFIX = "timeout and was killed"
+
+
+def timeout_error(timeout: int) -> str:
+    return f"Execution Error: script exceeded the {timeout}s {TIMEOUT_ERROR_SUFFIX}"
+
+
+def is_timeout(output: str) -> bool:
+    return output.split("\n", 1)[0].endswith(TIMEOUT_ERROR_SUFFIX)
+
+
+def elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
+
+
+def build_result(
+    output: "CappedOutput", stats: Dict[str, Any], error: Optional[str] = None
+) -> ExecutionResult:
+    """
+    Final result of a run: captured output (minus the shim's stats line,
+    prefixed by `error` if any) and the run's stats, including the script's
+    self-reported usage under "script".
+    """
+    text, script_stats = split_stats(output.text())
+    stats.update(
+        {
+            "output_bytes": output.total_bytes,
+            "truncated": output.truncated,
+            "timed_out": error is not None and error.endswith(TIMEOUT_ERROR_SUFFIX),
+            "script": script_stats,
+        }
+    )
+    if error:
+        text = error + "\n" + text
+    return ExecutionResult(text, stats)
+
+
+class CappedOutput:
+    """
+    Accumulates streamed script output up to `max_bytes`: keeps the head and
+    the tail, drops the middle and reports how much was dropped.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES):
+        self.tail_bytes = int(max_bytes * TAIL_FRACTION)
+        self.head_bytes = max_bytes - self.tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def write(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_bytes:
+            self.tail += chunk
+            del self.tail[: max(len(self.tail) - self.tail_bytes, 0)]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self.head) + len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + tail
+        omitted = self.total_bytes - len(self.head) - len(self.tail)
+        return (
+            f"{head}\n... [output truncated: {omitted} bytes omitted] ...\n{tail}"
+        )
+
+    def drain(self, chunks: Iterable[bytes]) -> threading.Thread:
+        """Consumes a chunk stream in a background thread (join when done)."""
+
+        def _read():
+            try:
+                for chunk in chunks:
+                    self.write(chunk)
+            except Exception:
+                pass  # Stream closed (e.g. the container was killed)
+
+        thread = threading.Thread(target=_read, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,243 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.config import get_settings
+from src.execution.output import (
+    CappedOutput,
+    ExecutionResult,
+    build_result,
+    elapsed_ms,
+    sandbox_limits,
+    timeout_error,
+)
+from src.execution.sandbox import DockerSandbox, read_shim
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_USES = 20
+
+# Label identifying pool containers (stale ones are removed at startup)
+POOL_LABEL = "civicaudit.sandbox-pool"
+
+# Layout inside a worker: the shim is preloaded once, scripts get a fresh
+# directory per execution and run as an unprivileged user, so they cannot
+# alter the shim or leave files/processes behind for the next lease.
+WORKER_HOME = "/opt/sandbox"
+RUN_DIR = "/tmp/run"
+RUN_USER = "nobody"
+IDLE_COMMAND = ["sleep", "infinity"]
+
+
+class _Worker:
+    """A started container waiting for scripts."""
+
+    def __init__(self, container):
+        self.container = container
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class SandboxPool:
+    """
+    Warm pool of pre-started DockerSandbox containers. Each execution leases
+    a worker, runs the script with `exec_run` and hands the worker back;
+    workers are destroyed after `sandbox.max_uses` executions or on any
+    anomaly, and replaced in the background.
+    """
+
+    def __init__(
+        self,
+        sandbox: Optional[DockerSandbox] = None,
+        size: Optional[int] = None,
+        max_uses: Optional[int] = None,
+    ):
+        settings = get_settings().get("sandbox", {})
+        self.sandbox = sandbox or DockerSandbox()
+        self.client = self.sandbox.client
+        self.size = size or settings.get("pool_size", DEFAULT_POOL_SIZE)
+        self.max_uses = max_uses or settings.get("max_uses", DEFAULT_MAX_USES)
+
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._live = 0  # Idle + leased + being created
+        self._closed = False
+        self.stats: Dict[str, int] = {
+            "created": 0,
+            "destroyed": 0,
+            "leases": 0,
+            "cold_leases": 0,
+            "anomalies": 0,
+        }
+
+        self._remove_stale()
+        self._refill()
+        atexit.register(self.shutdown)
+
+    def _remove_stale(self):
+        # Containers left behind by a previous process that did not shut down
+        try:
+            for container in self.client.containers.list(
+                all=True, filters={"label": POOL_LABEL}
+            ):
+                container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Could not remove stale sandbox containers: {e}")
+
+    def _spawn(self) -> _Worker:
+        config = self.sandbox.container_config(IDLE_COMMAND)
+        config["labels"] = {POOL_LABEL: "1"}
+        config["environment"]["PYTHONPATH"] = WORKER_HOME
+        config["environment"]["HOME"] = RUN_DIR
+
+        container = self.client.containers.create(**config)
+        try:
+            container.start()
+            self.sandbox.put_files(container, "/opt", {"sandbox/shim.py": read_shim()})
+        except Exception:
+            container.remove(force=True)
+            raise
+
+        with self._lock:
+            self.stats["created"] += 1
+        return _Worker(container)
+
+    def _refill(self):
+        """Starts workers in the background until the pool is back to size."""
+        with self._lock:
+            missing = 0 if self._closed else self.size - self._live
+            self._live += max(missing, 0)
+
+        def _add():
+            try:
+                self._idle.put(self._spawn())
+            except Exception as e:
+                logger.error(f"Failed to start sandbox worker: {e}")
+                with self._lock:
+                    self._live -= 1
+
+        for _ in range(missing):
+            threading.Thread(target=_add, daemon=True).start()
+
+    def _destroy(self, worker: _Worker):
+        try:
+            worker.container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Failed to remove sandbox worker: {e}")
+        with self._lock:
+            self._live -= 1
+            self.stats["destroyed"] += 1
+
+    def lease(self) -> _Worker:
+        """Takes an idle worker, or starts one when the pool is drained."""
+        with self._lock:
+            self.stats["leases"] += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            self.stats["cold_leases"] += 1
+            self._live += 1
+        try:
+            return self._spawn()
+        except Exception:
+            with self._lock:
+                self._live -= 1
+            raise
+
+    def release(self, worker: _Worker, healthy: bool = True):
+        """Resets and returns a worker to the pool, or destroys it."""
+        worker.uses += 1
+        recycle = not healthy or self._closed or worker.uses >= self.max_uses
+        if not recycle:
+            try:
+                # Kill leftover processes of the script's user, drop its files
+                worker.container.exec_run(["sh", "-c", "kill -9 -1"], user=RUN_USER)
+                exit_code, _ = worker.container.exec_run(["rm", "-rf", RUN_DIR])
+                worker.container.reload()
+                recycle = exit_code != 0 or worker.container.status != "running"
+            except Exception:
+                recycle = True
+
+        if recycle:
+            if not healthy:
+                with self._lock:
+                    self.stats["anomalies"] += 1
+            self._destroy(worker)
+            self._refill()
+        else:
+            self._idle.put(worker)
+
+    def execute(self, code: str, timeout: Optional[int] = None) -> ExecutionResult:
+        """
+        Executes python code in a leased worker. Same contract as
+        DockerSandbox.execute (timeout, capped streamed output, stats).
+        """
+        timeout, max_output_bytes = sandbox_limits(timeout)
+        stats: Dict[str, Any] = {"backend": "docker-pool"}
+
+        started_at = time.perf_counter()
+        cold_leases = self.stats["cold_leases"]
+        try:
+            worker = self.lease()
+        except Exception as e:
+            return ExecutionResult(f"System Error: {str(e)}", stats)
+        stats["lease_ms"] = elapsed_ms(started_at)
+        stats["cold_lease"] = self.stats["cold_leases"] > cold_leases
+        stats["worker_uses"] = worker.uses
+
+        healthy = True
+        try:
+            started_at = time.perf_counter()
+            self.sandbox.put_files(
+                worker.container,
+                "/tmp",
+                {"run/script.py": "from shim import *\n\n" + code},
+                dirs=["run"],
+            )
+            exec_id = self.client.api.exec_create(
+                worker.container.id,
+                ["python", f"{RUN_DIR}/script.py"],
+                user=RUN_USER,
+                workdir=RUN_DIR,
+                # Workers outlive ETL runs: point at the current snapshot
+                environment=self.sandbox.data_environment(),
+            )["Id"]
+            stats["start_ms"] = elapsed_ms(started_at)
+
+            started_at = time.perf_counter()
+            output = CappedOutput(max_output_bytes)
+            reader = output.drain(self.client.api.exec_start(exec_id, stream=True))
+            reader.join(timeout=timeout)
+            stats["run_ms"] = elapsed_ms(started_at)
+
+            if reader.is_alive():
+                # Timed out: the worker is discarded (kills the script too)
+                healthy = False
+                return build_result(output, stats, timeout_error(timeout))
+            return build_result(output, stats)
+
+        except Exception as e:
+            healthy = False
+            return ExecutionResult(f"System Error: {str(e)}", stats)
+        finally:
+            # Reset off the critical path; the result is already available
+            threading.Thread(
+                target=self.release, args=(worker, healthy), daemon=True
+            ).start()
+
+    def shutdown(self):
+        """Removes every idle worker; leased ones are removed on release."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(worker)
@@ -1,12 +1,47 @@
+import io
 import logging
 import os
+import stat
+import tarfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import docker
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ReadTimeout
 
 from src.config import get_settings
+from src.etl.database import DatabaseManager
+from src.execution.output import (
+    CappedOutput,
+    ExecutionResult,
+    build_result,
+    elapsed_ms,
+    sandbox_limits,
+    timeout_error,
+)
 
 logger = logging.getLogger(__name__)
 
+# Where the MCP socket directory is mounted inside sandbox containers
+SANDBOX_SOCKET_DIR = "/run/mcp"
+
+# Where the data directory is mounted (read-only) when sandbox.data_mode is
+# "local", so the shim can query the published snapshot without the server
+SANDBOX_DATA_DIR = "/data"
+
+# Max processes/threads per sandbox container (fork bombs)
+DEFAULT_PIDS_LIMIT = 128
+
+SHIM_PATH = os.path.join(os.path.dirname(__file__), "shim.py")
+
+
+def read_shim() -> str:
+    """Source of the MCP client shim made available to sandboxed code."""
+    with open(SHIM_PATH, "r") as f:
+        return f.read()
+
 
 class DockerSandbox:
     def __init__(self):
@@ -16,6 +51,7 @@ class DockerSandbox:
         except KeyError as e:
             raise ValueError("Missing 'sandbox.image' in config.yaml") from e
 
+        self.db_manager = DatabaseManager()
         self.client = docker.from_env()
         self._ensure_image()
 
@@ -23,67 +59,295 @@ class DockerSandbox:
         try:
             self.client.images.get(self.image)
         except docker.errors.ImageNotFound:
-            logger.info(f"Pulling image {self.image}...")
-            self.client.images.pull(self.image)
+            dockerfile = self.settings["sandbox"].get("dockerfile")
+            if dockerfile and os.path.exists(dockerfile):
+                # The sandbox Dockerfile copies nothing: no build context
+                logger.info(f"Building image {self.image} from {dockerfile}...")
+                with open(dockerfile, "rb") as f:
+                    self.client.images.build(fileobj=f, tag=self.image, rm=True)
+            else:
+                logger.info(f"Pulling image {self.image}...")
+                self.client.images.pull(self.image)
 
-    def execute(self, code: str, timeout: int = 30) -> str:
+    def _socket_mount(self):
         """
-        Executes python code in an ephemeral docker container using a mounted script.
+        Returns (host_dir, socket_name) for the MCP Unix socket when it can be
+        bind-mounted into sandbox containers, else None (TCP is used).
         """
+        socket_path = os.environ.get("MCP_SOCKET") or self.settings.get(
+            "mcp", {}
+        ).get("socket_path")
+        if not socket_path:
+            return None
         try:
-            shim_path = os.path.join(os.path.dirname(__file__), "shim.py")
-            with open(shim_path, "r") as f:
-                shim_code = f.read()
-
-            full_code = shim_code + "\n\n" + code
-
-            network_name = os.environ.get("DOCKER_NETWORK_NAME", None)
-            mcp_host = os.environ.get("MCP_HOST", "host.docker.internal")
-            mcp_port = os.environ.get("MCP_PORT", "8000")
-
-            create_kwargs = {
-                "image": self.image,
-                "command": ["python", "/tmp/script.py"],
-                "environment": {"MCP_HOST": mcp_host, "MCP_PORT": mcp_port},
-                "mem_limit": "512m",
-                "detach": True,  # Return container object
-            }
-
-            if network_name:
-                create_kwargs["network"] = network_name
-            else:
-                create_kwargs["extra_hosts"] = {"host.docker.internal": "host-gateway"}
-                create_kwargs["network_mode"] = "host"
+            if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                return None
+        except OSError:
+            return None
 
-            container = self.client.containers.create(**create_kwargs)
+        # Bind mounts are resolved by the Docker daemon, i.e. on the host.
+        # Inside a container the host-side directory must be provided.
+        host_dir = os.environ.get("MCP_SOCKET_HOST_DIR")
+        if not host_dir:
+            if os.path.exists("/.dockerenv"):
+                return None
+            host_dir = os.path.dirname(os.path.abspath(socket_path))
+        return host_dir, os.path.basename(socket_path)
 
-            try:
-                import io
-                import tarfile
+    def _data_mount(self) -> Optional[Tuple[str, str]]:
+        """
+        (host_dir, local_dir) of the data directory to mount read-only into
+        sandbox containers when `sandbox.data_mode` is "local", else None.
+        """
+        if self.settings.get("sandbox", {}).get("data_mode", "remote") != "local":
+            return None
+        local_dir = os.path.dirname(os.path.abspath(self.db_manager.base_path))
+        host_dir = os.environ.get("DATA_HOST_DIR")
+        if not host_dir:
+            if os.path.exists("/.dockerenv"):
+                return None
+            host_dir = local_dir
+        return host_dir, local_dir
 
-                tar_stream = io.BytesIO()
-                with tarfile.open(fileobj=tar_stream, mode="w") as tar:
-                    tar_data = full_code.encode("utf-8")
-                    tarinfo = tarfile.TarInfo(name="script.py")
-                    tarinfo.size = len(tar_data)
-                    tar.addfile(tarinfo, io.BytesIO(tar_data))
-                tar_stream.seek(0)
+    def data_environment(self) -> Dict[str, str]:
+        """
+        Env pinning the shim to the generation readers see right now (the
+        one pinned for the request): its MCP queries ask the server for that
+        generation, and with a mounted data directory it reads the snapshot
+        file directly.
+        """
+        generation = self.db_manager.current_generation()
+        env = {"AUDIT_DB_GENERATION": generation} if generation else {}
+        mount = self._data_mount()
+        if not mount:
+            return env
+        path = self.db_manager.db_path
+        relative = os.path.relpath(os.path.abspath(path), mount[1])
+        if relative.startswith(".."):
+            return env
+        env.update({
+            "AUDIT_DB_PATH": f"{SANDBOX_DATA_DIR}/{relative}",
+        })
+        return env
+
+    def container_config(self, command: List[str]) -> Dict[str, Any]:
+        """
+        Keyword arguments for `containers.create`: image, limits, MCP
+        connection settings (env + Unix socket mount), the read-only data
+        mount (local data mode) and networking.
+        """
+        sandbox_settings = self.settings.get("sandbox", {})
+        network_name = os.environ.get("DOCKER_NETWORK_NAME", None)
+        mcp_host = os.environ.get("MCP_HOST", "host.docker.internal")
+        mcp_port = os.environ.get("MCP_PORT", "8000")
+
+        create_kwargs = {
+            "image": self.image,
+            "command": command,
+            "environment": {"MCP_HOST": mcp_host, "MCP_PORT": mcp_port},
+            "mem_limit": sandbox_settings.get("memory_limit", "512m"),
+            # No swap on top of the memory limit
+            "memswap_limit": sandbox_settings.get("memory_limit", "512m"),
+            "pids_limit": sandbox_settings.get("pids_limit", DEFAULT_PIDS_LIMIT),
+            "detach": True,  # Return container object
+        }
+        if sandbox_settings.get("cpu_limit"):
+            create_kwargs["nano_cpus"] = int(float(sandbox_settings["cpu_limit"]) * 1e9)
 
-                container.put_archive("/tmp", tar_stream)
+        volumes = {}
+        socket_mount = self._socket_mount()
+        if socket_mount:
+            host_dir, socket_name = socket_mount
+            volumes[host_dir] = {"bind": SANDBOX_SOCKET_DIR, "mode": "ro"}
+            create_kwargs["environment"]["MCP_SOCKET"] = (
+                f"{SANDBOX_SOCKET_DIR}/{socket_name}"
+            )
+
+        data_mount = self._data_mount()
+        if data_mount:
+            volumes[data_mount[0]] = {"bind": SANDBOX_DATA_DIR, "mode": "ro"}
+        if volumes:
+            create_kwargs["volumes"] = volumes
+
+        if network_name:
+            create_kwargs["network"] = network_name
+        else:
+            create_kwargs["extra_hosts"] = {"host.docker.internal": "host-gateway"}
+            create_kwargs["network_mode"] = "host"
+
+        return create_kwargs
+
+    @staticmethod
+    def put_files(container, path: str, files: Dict[str, str], dirs=()):
+        """
+        Copies in-memory files (name -> content) into `path` in the container.
+        `dirs` are created first, world-writable.
+        """
+        tar_stream = io.BytesIO()
+        with tarfile.open(fileobj=tar_stream, mode="w") as tar:
+            for name in dirs:
+                tarinfo = tarfile.TarInfo(name=name)
+                tarinfo.type = tarfile.DIRTYPE
+                tarinfo.mode = 0o777
+                tar.addfile(tarinfo)
+            for name, content in files.items():
+                tar_data = content.encode("utf-8")
+                tarinfo = tarfile.TarInfo(name=name)
+                tarinfo.size = len(tar_data)
+                tarinfo.mode = 0o644
+                tar.addfile(tarinfo, io.BytesIO(tar_data))
+        tar_stream.seek(0)
+        container.put_archive(path, tar_stream)
 
+    def execute(self, code: str, timeout: Optional[int] = None) -> ExecutionResult:
+        """
+        Executes python code in an ephemeral docker container using a mounted script.
+        The container is killed after `timeout` seconds (default
+        `sandbox.timeout`); output is streamed and capped at
+        `sandbox.max_output_bytes`. Returns the output and the run's stats
+        (lifecycle durations, container usage, MCP traffic).
+        """
+        timeout, max_output_bytes = sandbox_limits(timeout)
+        stats: Dict[str, Any] = {"backend": "docker"}
+        try:
+            full_code = read_shim() + "\n\n" + code
+
+            started_at = time.perf_counter()
+            config = self.container_config(["python", "/tmp/script.py"])
+            config["environment"].update(self.data_environment())
+            container = self.client.containers.create(**config)
+            stats["create_ms"] = elapsed_ms(started_at)
+
+            try:
+                started_at = time.perf_counter()
+                self.put_files(container, "/tmp", {"script.py": full_code})
                 container.start()
-                container.wait()
-                logs = container.logs()
+                stats["start_ms"] = elapsed_ms(started_at)
 
-                return logs.decode("utf-8")
+                started_at = time.perf_counter()
+                usage = _ContainerUsage(container)
+                output = CappedOutput(max_output_bytes)
+                reader = output.drain(container.logs(stream=True, follow=True))
+                error = None
+                try:
+                    container.wait(timeout=timeout)
+                except (ReadTimeout, RequestsConnectionError):
+                    container.kill()
+                    error = timeout_error(timeout)
+                reader.join(timeout=5)
+                stats["run_ms"] = elapsed_ms(started_at)
+                stats.update(usage.snapshot())
 
             finally:
+                started_at = time.perf_counter()
                 try:
                     container.remove(force=True)
                 except Exception:
                     pass
+                stats["teardown_ms"] = elapsed_ms(started_at)
+
+            return build_result(output, stats, error)
 
         except docker.errors.ContainerError as e:
-            return f"Execution Error: {str(e)}"
+            return ExecutionResult(f"Execution Error: {str(e)}", stats)
         except Exception as e:
-            return f"System Error: {str(e)}"
+            return ExecutionResult(f"System Error: {str(e)}", stats)
+
+
+class _ContainerUsage:
+    """
+    Samples `docker stats` while a container runs: peak memory and
+    cumulative CPU time. Samples arrive about once a second, so very short
+    runs may have none (the shim's own rusage is reported as well).
+    """
+
+    def __init__(self, container):
+        self.samples = 0
+        self.peak_memory_bytes = 0
+        self.cpu_ns = 0
+        self._stream = container.stats(stream=True, decode=True)
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        try:
+            for sample in self._stream:
+                memory = sample.get("memory_stats") or {}
+                cpu = (sample.get("cpu_stats") or {}).get("cpu_usage") or {}
+                if not memory or not cpu.get("total_usage"):
+                    continue  # Container already stopped
+                self.samples += 1
+                self.peak_memory_bytes = max(
+                    self.peak_memory_bytes,
+                    memory.get("max_usage", 0),
+                    memory.get("usage", 0),
+                )
+                self.cpu_ns = max(self.cpu_ns, cpu["total_usage"])
+        except Exception:
+            pass  # Stream ends when the container is removed
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"peak_memory_bytes": None, "cpu_ms": None}
+        return {
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "cpu_ms": round(self.cpu_ns / 1e6, 2),
+        }
+
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+
+def get_sandbox():
+    """
+    Process-wide sandbox used by the agents, chosen by `sandbox.backend`:
+    - "docker": a warm SandboxPool when `sandbox.pool_size` > 0, otherwise
+      a DockerSandbox creating one container per execution;
+    - "subprocess": a SubprocessSandbox (namespaces + rlimits, no Docker
+      daemon). When isolation is not permitted on this host,
+      `sandbox.isolation_fallback` decides: "docker" (default) switches to
+      the Docker backend, "error" refuses to start, "rlimits" keeps the
+      subprocess backend unisolated (with a warning).
+    All expose `execute(code, timeout) -> ExecutionResult`.
+    """
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is None:
+            settings = get_settings().get("sandbox", {})
+            backend = settings.get("backend", "docker")
+            if backend == "subprocess":
+                from src.execution.local import (
+                    DEFAULT_ISOLATION_FALLBACK,
+                    SubprocessSandbox,
+                )
+
+                sandbox = SubprocessSandbox()
+                fallback = settings.get(
+                    "isolation_fallback", DEFAULT_ISOLATION_FALLBACK
+                )
+                if not sandbox.isolation_unavailable or fallback == "rlimits":
+                    _sandbox = sandbox
+                elif fallback == "docker":
+                    logger.warning(
+                        "Sandbox: isolation unavailable for the subprocess "
+                        "backend; falling back to the Docker backend."
+                    )
+                    backend = "docker"
+                else:
+                    raise RuntimeError(
+                        "Sandbox: isolation unavailable for the subprocess "
+                        "backend (namespaces are not permitted here) and "
+                        f"sandbox.isolation_fallback is {fallback!r}"
+                    )
+            if _sandbox is not None:
+                return _sandbox
+
+            if backend != "docker":
+                raise ValueError(f"Unknown sandbox.backend '{backend}'")
+            elif settings.get("pool_size", 0) > 0:
+                from src.execution.pool import SandboxPool
+
+                _sandbox = SandboxPool()
+            else:
+                _sandbox = DockerSandbox()
+        return _sandbox
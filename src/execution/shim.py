@@ -1,87 +1,325 @@
+import atexit
+import base64
 import json
 import os
 import socket
+import sqlite3
+import sys
+import time
 
 # Configuration (Injected or Default)
 MCP_HOST = os.environ.get("MCP_HOST", "host.docker.internal")
 MCP_PORT = int(os.environ.get("MCP_PORT", "8000"))
+# Unix socket bind-mounted by the sandbox (preferred over TCP when present)
+MCP_SOCKET = os.environ.get("MCP_SOCKET")
+# Seconds to wait on the server (connect or a single response)
+MCP_TIMEOUT = float(os.environ.get("MCP_TIMEOUT", "60"))
+# Print per-call timings to stderr when the script exits
+MCP_TIMING = os.environ.get("MCP_TIMING", "") not in ("", "0")
 
+# Read-only snapshot of the audit database mounted into the sandbox
+# (sandbox.data_mode: local); query helpers read it directly when present
+AUDIT_DB_PATH = os.environ.get("AUDIT_DB_PATH")
+# Data generation of the agent request: server-side queries read the same one
+AUDIT_DB_GENERATION = os.environ.get("AUDIT_DB_GENERATION")
+_local_db = None
+_local_stats = {"queries": 0, "ms": 0.0}
 
-def _rpc_call(method, params=None, msg_id=1):
+# Result encoding for tabular tools: MessagePack when the sandbox has it,
+# otherwise columnar JSON (column names sent once, one array per column)
+try:
+    import msgpack as _msgpack
+except ImportError:
+    try:
+        import ormsgpack as _msgpack
+    except ImportError:
+        _msgpack = None
+
+RESULT_ENCODING = "msgpack" if _msgpack else "columnar"
+
+
+def _connect(timeout):
     """
-    Sends a JSON-RPC request over a TCP socket and waits for a response.
+    Opens a connection to the MCP server: the Unix socket when it was
+    mounted into the sandbox, TCP otherwise.
     """
-    payload = {"jsonrpc": "2.0", "method": method, "id": msg_id}
-    if params:
-        payload["params"] = params
+    if MCP_SOCKET and os.path.exists(MCP_SOCKET):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(MCP_SOCKET)
+            return sock
+        except OSError:
+            sock.close()  # Fall back to TCP
+    return socket.create_connection((MCP_HOST, MCP_PORT), timeout=timeout)
 
-    # Connect to Server
-    try:
-        # Create a new socket for each call (Simple & Robust for this use case)
-        # For high-performance, we would reuse the socket, but that requires
-        # class-based Shim.
-        with socket.create_connection((MCP_HOST, MCP_PORT), timeout=10) as sock:
-            # Send Request (Newline delimited)
-            data = json.dumps(payload) + "\n"
-            sock.sendall(data.encode("utf-8"))
 
-            # Read Response
-            # We expect a single line JSON response
-            f = sock.makefile("r", encoding="utf-8")
-            response_line = f.readline()
+def _decode_columns(structured):
+    """
+    Returns (columns, values) from a columnar or msgpack structured result.
+    """
+    if structured.get("encoding") == "msgpack":
+        table = _msgpack.unpackb(base64.b64decode(structured["data"]))
+        return table["columns"], table["values"]
+    return structured.get("columns", []), structured.get("values", [])
 
-            if not response_line:
-                raise Exception("Server closed connection without response")
 
-            return json.loads(response_line)
+class _MCPClient:
+    """
+    Persistent JSON-RPC connection to the MCP server, shared by every helper
+    in the script. The `initialize` handshake happens once per connection;
+    requests carry unique ids so several can be in flight (pipelined) and
+    responses are matched by id, whatever order they arrive in. A broken
+    connection is re-established once per call (tools are read-only, so
+    retrying is safe).
+    """
 
-    except ConnectionRefusedError as e:
-        raise Exception(
-            f"Could not connect to MCP Server at {MCP_HOST}:{MCP_PORT}"
-        ) from e
-    except Exception as e:
-        raise Exception(f"RPC/Network Error: {str(e)}") from e
+    def __init__(self):
+        self._sock = None
+        self._reader = None
+        self._next_id = 0
+        self._unclaimed = {}
+        self.encoding = RESULT_ENCODING
+        self.max_inflight = None
+        self.stats = {
+            "calls": 0,
+            "connects": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "total_ms": 0.0,
+        }
+        self.timings = []
 
+    def _connect(self):
+        self._sock = _connect(timeout=MCP_TIMEOUT)
+        self._reader = self._sock.makefile("rb")
+        self.stats["connects"] += 1
 
-def query_sql(sql_query):
+        # Single handshake per connection; negotiates the result encoding
+        response = self._roundtrip(
+            [
+                (
+                    "initialize",
+                    {
+                        "protocolVersion": "2024-11-05",
+                        "capabilities": {
+                            "resultEncodings": [RESULT_ENCODING, "columnar"]
+                        },
+                        "clientInfo": {"name": "sandbox-shim", "version": "2.0"},
+                    },
+                )
+            ]
+        )[0]
+        capabilities = response.get("result", {}).get("capabilities", {})
+        self.encoding = capabilities.get("resultEncoding", RESULT_ENCODING)
+        self.max_inflight = capabilities.get("maxInflight")
+
+    def close(self):
+        for resource in (self._reader, self._sock):
+            try:
+                if resource:
+                    resource.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+        self._unclaimed = {}
+
+    def _pipeline(self, requests):
+        # Keeps at most `maxInflight` requests outstanding (server limit)
+        window = self.max_inflight or len(requests) or 1
+        responses = []
+        for start in range(0, len(requests), window):
+            responses.extend(self._roundtrip(requests[start : start + window]))
+        return responses
+
+    def _roundtrip(self, requests):
+        ids = []
+        lines = []
+        for method, params in requests:
+            self._next_id += 1
+            payload = {"jsonrpc": "2.0", "method": method, "id": self._next_id}
+            if method == "tools/call" and AUDIT_DB_GENERATION:
+                params = {**params, "generation": AUDIT_DB_GENERATION}
+            if params:
+                payload["params"] = params
+            ids.append(self._next_id)
+            lines.append(json.dumps(payload) + "\n")
+
+        # Pipelined: all requests go out before any response is read
+        data = "".join(lines).encode("utf-8")
+        self._sock.sendall(data)
+        self.stats["bytes_sent"] += len(data)
+
+        responses = {}
+        wanted = set(ids)
+        while wanted:
+            for msg_id in list(wanted):
+                if msg_id in self._unclaimed:
+                    responses[msg_id] = self._unclaimed.pop(msg_id)
+                    wanted.discard(msg_id)
+            if not wanted:
+                break
+
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError("Server closed connection without response")
+            self.stats["bytes_received"] += len(line)
+
+            message = json.loads(line)
+            msg_id = message.get("id") if isinstance(message, dict) else None
+            if msg_id is None:
+                # Connection-level error (e.g. server busy, parse error)
+                raise Exception(f"MCP Error: {message}")
+            if msg_id in wanted:
+                responses[msg_id] = message
+                wanted.discard(msg_id)
+            else:
+                self._unclaimed[msg_id] = message
+
+        return [responses[msg_id] for msg_id in ids]
+
+    def calls(self, requests):
+        """Sends (method, params) requests on the shared connection."""
+        started_at = time.perf_counter()
+        try:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._pipeline(requests)
+                except (OSError, ConnectionError, ValueError):
+                    self.close()
+                    if attempt:
+                        raise
+        except ConnectionRefusedError as e:
+            raise Exception(
+                f"Could not connect to MCP Server at {MCP_HOST}:{MCP_PORT}"
+            ) from e
+        except Exception as e:
+            raise Exception(f"RPC/Network Error: {str(e)}") from e
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            self.stats["calls"] += len(requests)
+            self.stats["total_ms"] += elapsed_ms
+            if MCP_TIMING:
+                methods = ",".join(
+                    (params or {}).get("name", method) for method, params in requests
+                )
+                self.timings.append((methods, elapsed_ms))
+
+    def call(self, method, params=None):
+        return self.calls([(method, params)])[0]
+
+    def report(self):
+        """Prints call timings to stderr (enabled with MCP_TIMING=1)."""
+        for methods, elapsed_ms in self.timings:
+            print(f"[mcp] {methods}: {elapsed_ms:.1f}ms", file=sys.stderr)
+        print(
+            f"[mcp] {self.stats['calls']} calls, {self.stats['connects']} connects, "
+            f"{self.stats['total_ms']:.1f}ms, sent={self.stats['bytes_sent']}B "
+            f"received={self.stats['bytes_received']}B",
+            file=sys.stderr,
+        )
+
+
+def _report_stats():
+    # Read by the sandbox (src/execution/output.py) and removed from the output
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats = {
+        "mcp_calls": _client.stats["calls"],
+        "mcp_connects": _client.stats["connects"],
+        "mcp_ms": round(_client.stats["total_ms"], 2),
+        "mcp_bytes_sent": _client.stats["bytes_sent"],
+        "mcp_bytes_received": _client.stats["bytes_received"],
+        "local_queries": _local_stats["queries"],
+        "local_ms": round(_local_stats["ms"], 2),
+        "cpu_ms": round((usage.ru_utime + usage.ru_stime) * 1000, 2),
+        "max_rss_kb": usage.ru_maxrss,
+    }
+    sys.stdout.flush()
+    print("\n__SANDBOX_STATS__" + json.dumps(stats), file=sys.stderr, flush=True)
+
+
+_client = _MCPClient()
+atexit.register(_report_stats)
+atexit.register(_client.close)
+if MCP_TIMING:
+    atexit.register(_client.report)
+
+
+def _rpc_call(method, params=None):
+    """
+    Sends a JSON-RPC request on the shared connection and waits for its response.
+    """
+    return _client.call(method, params)
+
+
+def _rpc_batch(requests):
+    """
+    Sends several (method, params) requests pipelined on the shared
+    connection; responses are returned in the same order, correlated by id.
+    """
+    return _client.calls(requests)
+
+
+def _local_connection():
     """
-    Executes a SQL query via the MCP Server.
+    Read-only connection to the mounted snapshot, or None (no snapshot, or
+    it cannot be opened) so queries go through the MCP server.
     """
-    # 1. Initialize (Handshake)
+    global _local_db, AUDIT_DB_PATH
+    if _local_db is None and AUDIT_DB_PATH:
+        try:
+            conn = sqlite3.connect(f"file:{AUDIT_DB_PATH}?mode=ro", uri=True)
+            conn.execute("PRAGMA query_only = 1")
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+            _local_db = conn
+        except sqlite3.Error:
+            AUDIT_DB_PATH = None  # Unusable: use the network from now on
+    return _local_db
+
+
+def _local_query(sql_query):
+    """
+    Runs a SELECT on the local snapshot: (columns, rows), an error string
+    (same text the server returns), or None when the server must be used.
+    """
+    if not sql_query.strip().upper().startswith("SELECT"):
+        return None  # The server owns validation of everything else
+    conn = _local_connection()
+    if conn is None:
+        return None
+
+    started_at = time.perf_counter()
     try:
-        _rpc_call(
-            "initialize",
-            {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {"name": "sandbox-shim", "version": "1.0"},
-            },
-            1,
-        )
-        # We don't strictly need to wait for initialized notification in this
-        # simple TCP adapter but good practice to follow flow if server expects it.
-        # calls are sequential on new socket in this implementation?
-        # WAIT. ephemeral socket means NEW connection every time.
-        # The TCP server I wrote doesn't persist state across connections about
-        # "initialization".
-        # It just processes messages.
-        # So "initialize" might be redundant per call but safe.
-        pass
-    except Exception:
-        pass  # Ignore init errors if server is already running/robust
-
-    # 2. Call Tool
-    response = _rpc_call(
-        "tools/call", {"name": "query_sql", "arguments": {"sql_query": sql_query}}, 2
-    )
+        cursor = conn.execute(sql_query)
+        columns = [d[0] for d in cursor.description or []]
+        return columns, cursor.fetchall()
+    except sqlite3.Error as e:
+        return f"Error executing query: {str(e)}"
+    finally:
+        _local_stats["queries"] += 1
+        _local_stats["ms"] += (time.perf_counter() - started_at) * 1000
+
 
+def _parse_query_result(response):
     if "error" in response:
         raise Exception(f"MCP Error: {response['error']}")
 
     if "result" in response:
         res = response["result"]
         if "structuredContent" in res:
-            return res["structuredContent"].get("result", [])
+            structured = res["structuredContent"]
+            if structured.get("encoding") in ("columnar", "msgpack"):
+                columns, values = _decode_columns(structured)
+                return [
+                    dict(zip(columns, row, strict=True))
+                    for row in zip(*values, strict=True)
+                ]
+            return structured.get("result", [])
 
         if "content" in res:
             items = []
@@ -101,13 +339,128 @@ def query_sql(sql_query):
     return response
 
 
+def query_sql(sql_query):
+    """
+    Executes a SQL query (local snapshot when mounted, else the MCP Server).
+    """
+    local = _local_query(sql_query)
+    if isinstance(local, str):
+        return [local]
+    if local is not None:
+        columns, rows = local
+        return [dict(zip(columns, row, strict=True)) for row in rows]
+
+    response = _rpc_call(
+        "tools/call",
+        {
+            "name": "query_sql",
+            "arguments": {"sql_query": sql_query},
+            "encoding": _client.encoding,
+        },
+    )
+    return _parse_query_result(response)
+
+
+def query_df(sql_query):
+    """
+    Executes a SQL query and returns a pandas DataFrame built column by
+    column from the columnar/msgpack result or the local snapshot (no
+    per-row dicts). Numeric columns come back typed (int64/float64); text
+    columns such as codes and years stay strings. Query errors raise.
+    e.g. df = query_df("SELECT mes_referencia, valor_pago FROM despesas WHERE ...")
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        # A plain message instead of an ImportError traceback
+        sys.exit(
+            "Execution Error: query_df needs pandas, which this sandbox image "
+            "does not have (see sandbox.image); use query_sql instead."
+        )
+
+    local = _local_query(sql_query)
+    if isinstance(local, str):
+        raise Exception(local)
+    if local is not None:
+        columns, rows = local
+        values = [list(col) for col in zip(*rows, strict=True)] or [
+            [] for _ in columns
+        ]
+        return _build_frame(pd, columns, values)
+
+    response = _rpc_call(
+        "tools/call",
+        {
+            "name": "query_sql",
+            "arguments": {"sql_query": sql_query},
+            "encoding": _client.encoding,
+        },
+    )
+    if "error" in response:
+        raise Exception(f"MCP Error: {response['error']}")
+
+    structured = response.get("result", {}).get("structuredContent", {})
+    if structured.get("encoding") in ("columnar", "msgpack"):
+        columns, values = _decode_columns(structured)
+    else:
+        # Empty or legacy row-wise result (or the server's error text)
+        rows = _parse_query_result(response)
+        if len(rows) == 1 and isinstance(rows[0], str) and rows[0].startswith("Error"):
+            raise Exception(rows[0])
+        return pd.DataFrame(rows)
+
+    return _build_frame(pd, columns, values)
+
+
+def _build_frame(pd, columns, values):
+    frame = pd.DataFrame(
+        dict(zip(columns, values, strict=True)), columns=columns, copy=False
+    )
+    for column in columns:
+        series = frame[column]
+        if series.dtype != object:
+            continue
+        # SQLite may return mixed ints/floats (plus NULLs) in one column;
+        # parse those, never strings.
+        present = series.dropna()
+        if len(present) and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in present
+        ):
+            frame[column] = pd.to_numeric(series)
+    return frame
+
+
+def query_many(sql_queries):
+    """
+    Executes several SQL queries in one round trip (pipelined on the shared
+    connection). The server runs them concurrently; results come back in
+    input order.
+    e.g. monthly = query_many([f"SELECT ... mes_referencia = '2024{m:02d}'" ...])
+    """
+    if _local_connection() is not None:
+        return [query_sql(sql) for sql in sql_queries]
+
+    responses = _rpc_batch(
+        [
+            (
+                "tools/call",
+                {
+                    "name": "query_sql",
+                    "arguments": {"sql_query": sql},
+                    "encoding": _client.encoding,
+                },
+            )
+            for sql in sql_queries
+        ]
+    )
+    return [_parse_query_result(response) for response in responses]
+
+
 def list_tables():
     """
     Lists tables in the database.
     """
-    # Simply call tool. Initialize irrelevant for this stateless TCP shim logic
-    # (My tcp_server.py implementation is naive and handles any request)
-    response = _rpc_call("tools/call", {"name": "list_tables", "arguments": {}}, 2)
+    response = _rpc_call("tools/call", {"name": "list_tables", "arguments": {}})
 
     if "error" in response:
         raise Exception(f"RPC Error calling list_tables: {response['error']}")
@@ -136,7 +489,6 @@ def describe_table(table_name):
     response = _rpc_call(
         "tools/call",
         {"name": "describe_table", "arguments": {"table_name": table_name}},
-        2,
     )
 
     if "result" in response:
@@ -154,7 +506,7 @@ def search_definitions(query: str):
     Search for table definitions.
     """
     response = _rpc_call(
-        "tools/call", {"name": "search_definitions", "arguments": {"query": query}}, 2
+        "tools/call", {"name": "search_definitions", "arguments": {"query": query}}
     )
 
     if "result" in response:
@@ -166,3 +518,31 @@ def search_definitions(query: str):
                 except Exception:
                     return content["text"]
     return ""
+
+
+def column_values(table_name, column_name=None, search=None):
+    """
+    Known values/frequencies/ranges of a table's columns (precomputed catalog).
+    """
+    arguments = {"table_name": table_name}
+    if column_name:
+        arguments["column_name"] = column_name
+    if search:
+        arguments["search"] = search
+
+    response = _rpc_call(
+        "tools/call", {"name": "column_values", "arguments": arguments}
+    )
+
+    if "error" in response:
+        raise Exception(f"RPC Error calling column_values: {response['error']}")
+
+    if "result" in response:
+        res = response["result"]
+        for content in res.get("content", []):
+            if content["type"] == "text":
+                try:
+                    return json.loads(content["text"])
+                except Exception:
+                    return content["text"]
+    return []
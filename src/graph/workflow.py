@@ -1,10 +1,12 @@
+import functools
 from typing import Optional
 import uuid
 
 from langchain_core.messages import HumanMessage
-from langgraph.graph import END, StateGraph
+from langgraph.graph import END, START, StateGraph
 from langgraph.checkpoint.memory import MemorySaver
 
+from src.etl.database import DatabaseManager
 from src.schemas.state import AgentState
 from src.agents.analyst import generate, critique, execute, check_execution, should_continue
 from src.agents.guardrail import guardrail_input, guardrail_output
@@ -18,7 +20,28 @@ def check_guardrail(state: AgentState):
     if verdict == "UNSAFE":
         print("--- DECISION: BLOCKED BY GUARDRAIL ---")
         return END
-    return "planner"
+    return "generate_sql"
+
+
+def speculative(node):
+    """
+    Wraps a node that runs before the input guardrail's verdict is known:
+    it is skipped once the verdict is UNSAFE (its work would be discarded).
+    """
+
+    @functools.wraps(node)
+    def wrapper(state: AgentState):
+        if state.get("guardrail_verdict") == "UNSAFE":
+            print(f"--- SKIPPED (BLOCKED BY GUARDRAIL): {node.__name__} ---")
+            return {}
+        return node(state)
+
+    return wrapper
+
+
+def join_preparation(state: AgentState):
+    """Barrier where the guardrail, planner and schema branches meet."""
+    return {}
 
 def should_check_sql(state: AgentState):
     # Logic to decide if we need to check the SQL or if it's failed too many times
@@ -33,8 +56,24 @@ class AuditGraph:
 
     def __init__(self):
         self.memory = MemorySaver()
+        self.db_manager = DatabaseManager()
         self.graph = self._build_graph()
 
+    def pinned(self, node):
+        """
+        Wraps a node that reads the database: it runs against the data
+        generation pinned for the request, so the schema, the validated SQL
+        and the executed code all see the same data even if an ETL run
+        publishes a new generation meanwhile.
+        """
+
+        @functools.wraps(node)
+        def wrapper(state: AgentState):
+            with self.db_manager.pin_generation(state.get("data_generation")):
+                return node(state)
+
+        return wrapper
+
     def _build_graph(self):
         workflow = StateGraph(AgentState)
 
@@ -43,36 +82,40 @@ class AuditGraph:
         workflow.add_node("planner", planner)
         
         # Fiscal Agent Nodes (SQL Specialist)
-        workflow.add_node("list_tables", list_tables_node)
-        workflow.add_node("get_schema", get_schema_node)
+        workflow.add_node("list_tables", self.pinned(list_tables_node))
+        workflow.add_node("get_schema", speculative(self.pinned(get_schema_node)))
+        workflow.add_node("join", join_preparation)
         workflow.add_node("generate_sql", generate_query_node)
-        workflow.add_node("check_sql", check_query_node)
+        workflow.add_node("check_sql", self.pinned(check_query_node))
         
         # Analyst Agent Nodes (Python Specialist)
         workflow.add_node("generate", generate)
         workflow.add_node("critic", critique)
-        workflow.add_node("execute", execute)
+        workflow.add_node("execute", self.pinned(execute))
         workflow.add_node("guardrail_output", guardrail_output)
 
         # --- EDGES ---
         
-        # Entry Point
-        workflow.set_entry_point("guardrail_input")
+        # Entry: the input guardrail, the planner and schema loading start
+        # together; only the guardrail verdict decides whether the
+        # speculative planner/schema work is used.
+        workflow.add_edge(START, "guardrail_input")
+        workflow.add_edge(START, "planner")
+        workflow.add_edge(START, "list_tables")
+        workflow.add_edge("list_tables", "get_schema")
 
-        # Guardrail -> Planner
+        # Join (waits for all three branches) -> SQL generation, or END
+        workflow.add_edge(["guardrail_input", "planner", "get_schema"], "join")
         workflow.add_conditional_edges(
-            "guardrail_input",
+            "join",
             check_guardrail,
             {
-                "planner": "planner",
+                "generate_sql": "generate_sql",
                 END: END
             }
         )
 
-        # Planner -> Fiscal Agent Pipeline
-        workflow.add_edge("planner", "list_tables")
-        workflow.add_edge("list_tables", "get_schema")
-        workflow.add_edge("get_schema", "generate_sql")
+        # Fiscal Agent Pipeline
         workflow.add_edge("generate_sql", "check_sql")
         
         # Fiscal Agent -> Analyst Agent (Handover valid SQL)
@@ -117,8 +160,12 @@ class AuditGraph:
             "iterations": 0,
             "error": None,
             "evaluation": None,
-            "sql_query": None
+            "sql_query": None,
+            "sql_warnings": None,
         }
 
-        final_state = self.graph.invoke(inputs, config=config)
+        # One data generation per request, held (not pruned) until it ends
+        with self.db_manager.pin_generation() as generation:
+            inputs["data_generation"] = generation
+            final_state = self.graph.invoke(inputs, config=config)
         return final_state.get("output", "No output generated.")
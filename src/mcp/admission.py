@@ -0,0 +1,172 @@
+import contextvars
+import itertools
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from src.config import get_settings
+
+# JSON-RPC error codes for rejected work (server-defined range)
+ERROR_SERVER_BUSY = -32001
+ERROR_TOO_MANY_INFLIGHT = -32002
+ERROR_BUDGET_EXCEEDED = -32003
+
+DEFAULT_LIMITS = {
+    "max_connections": 64,
+    "max_inflight_per_client": 16,
+    # Budgets cover the last `budget_window_s` seconds of a session, so
+    # long-lived sessions (stdio, SSE) recover instead of being cut off
+    "session_query_time_budget_s": 300,
+    "session_result_bytes_budget": 256 * 1024 * 1024,
+    "budget_window_s": 600,
+}
+
+# Client session of the MCP request being handled (stdio / HTTP transports)
+current_client: contextvars.ContextVar = contextvars.ContextVar(
+    "current_client", default=None
+)
+
+_session_ids = itertools.count(1)
+
+
+class AdmissionError(Exception):
+    """Raised when a connection or call is rejected by admission control."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class ClientSession:
+    """Usage of one client connection (a sandbox script, an MCP session)."""
+
+    def __init__(self, peer: str):
+        self.id = next(_session_ids)
+        self.peer = peer
+        self.inflight = 0
+        self.calls = 0
+        self.query_time_ms = 0.0
+        self.result_bytes = 0
+        self.opened_at = time.time()
+        # (finished_at, query_time_ms, result_bytes) of the calls in the window
+        self.recent: Deque[Tuple[float, float, int]] = deque()
+        self.window_query_time_ms = 0.0
+        self.window_result_bytes = 0
+
+    def charge(self, query_time_ms: float, result_bytes: int):
+        self.calls += 1
+        self.query_time_ms += query_time_ms
+        self.result_bytes += result_bytes
+        self.recent.append((time.monotonic(), query_time_ms, result_bytes))
+        self.window_query_time_ms += query_time_ms
+        self.window_result_bytes += result_bytes
+
+    def expire(self, window_s: float):
+        """Drops the calls that finished more than `window_s` seconds ago."""
+        cutoff = time.monotonic() - window_s
+        while self.recent and self.recent[0][0] < cutoff:
+            _, query_time_ms, result_bytes = self.recent.popleft()
+            self.window_query_time_ms -= query_time_ms
+            self.window_result_bytes -= result_bytes
+
+
+class AdmissionController:
+    """
+    Fast-fail admission control shared by every MCP transport: caps open
+    connections, in-flight calls per client, and the tool time and result
+    bytes a single session may consume within a rolling window
+    (`budget_window_s`). All methods run on the event loop.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Any]] = None):
+        settings = get_settings().get("mcp", {}).get("admission", {})
+        self.limits = {**DEFAULT_LIMITS, **settings, **(limits or {})}
+        self.sessions: Dict[int, ClientSession] = {}
+        self.counters = {
+            "connections_accepted": 0,
+            "connections_rejected": 0,
+            "calls_accepted": 0,
+            "calls_rejected_inflight": 0,
+            "calls_rejected_budget": 0,
+            "results_rejected_budget": 0,
+        }
+
+    def open_session(self, peer: str) -> ClientSession:
+        if len(self.sessions) >= self.limits["max_connections"]:
+            self.counters["connections_rejected"] += 1
+            raise AdmissionError(
+                ERROR_SERVER_BUSY,
+                f"Server busy: {len(self.sessions)} open connections "
+                f"(max {self.limits['max_connections']})",
+            )
+        session = ClientSession(peer)
+        self.sessions[session.id] = session
+        self.counters["connections_accepted"] += 1
+        return session
+
+    def close_session(self, session: ClientSession):
+        self.sessions.pop(session.id, None)
+
+    def admit(self, session: ClientSession):
+        """Reserves an in-flight slot for one call or raises AdmissionError."""
+        session.expire(self.limits["budget_window_s"])
+        budget_ms = self.limits["session_query_time_budget_s"] * 1000
+        if session.window_query_time_ms >= budget_ms:
+            self.counters["calls_rejected_budget"] += 1
+            raise AdmissionError(
+                ERROR_BUDGET_EXCEEDED,
+                "Session query-time budget exhausted "
+                f"({self.limits['session_query_time_budget_s']}s per "
+                f"{self.limits['budget_window_s']}s)",
+            )
+        if session.window_result_bytes >= self.limits["session_result_bytes_budget"]:
+            self.counters["calls_rejected_budget"] += 1
+            raise AdmissionError(
+                ERROR_BUDGET_EXCEEDED,
+                "Session result-size budget exhausted "
+                f"({self.limits['session_result_bytes_budget']} bytes per "
+                f"{self.limits['budget_window_s']}s)",
+            )
+        if session.inflight >= self.limits["max_inflight_per_client"]:
+            self.counters["calls_rejected_inflight"] += 1
+            raise AdmissionError(
+                ERROR_TOO_MANY_INFLIGHT,
+                f"Too many in-flight requests "
+                f"(max {self.limits['max_inflight_per_client']} per client)",
+            )
+        session.inflight += 1
+        self.counters["calls_accepted"] += 1
+
+    def check_result(self, session: ClientSession, result_bytes: int):
+        """
+        Raises AdmissionError when a result would take the session over its
+        result-size budget; it is then not sent (nor charged).
+        """
+        session.expire(self.limits["budget_window_s"])
+        budget = self.limits["session_result_bytes_budget"]
+        if session.window_result_bytes + result_bytes > budget:
+            self.counters["results_rejected_budget"] += 1
+            raise AdmissionError(
+                ERROR_BUDGET_EXCEEDED,
+                f"Result of {result_bytes} bytes exceeds the session result-size "
+                f"budget ({budget - session.window_result_bytes} of {budget} bytes "
+                f"left per {self.limits['budget_window_s']}s); narrow the query "
+                "(filters, LIMIT, aggregation).",
+            )
+
+    def release(self, session: ClientSession, duration_ms: float, result_bytes: int):
+        """
+        Frees the call's slot and charges its cost to the session budgets:
+        `duration_ms` is the time the tool ran in the worker (queueing
+        excluded), `result_bytes` what was sent back.
+        """
+        session.inflight -= 1
+        session.charge(duration_ms, result_bytes)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "connections_active": len(self.sessions),
+            "calls_inflight": sum(s.inflight for s in self.sessions.values()),
+            "limits": self.limits,
+        }
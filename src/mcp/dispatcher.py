@@ -0,0 +1,151 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TOOL_CONCURRENCY = 4
+
+
+class ToolDispatcher:
+    """
+    Runs synchronous tool handlers on a bounded thread pool so the asyncio
+    event loop stays free for I/O. Each tool has its own concurrency limit;
+    calls over the limit wait in a queue, and queueing/run times are tracked.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable],
+        max_workers: Optional[int] = None,
+        tool_concurrency: Optional[Dict[str, int]] = None,
+    ):
+        settings = get_settings().get("mcp", {})
+        self.handlers = handlers
+        self.max_workers = max_workers or settings.get(
+            "max_workers", DEFAULT_MAX_WORKERS
+        )
+        limits = dict(settings.get("tool_concurrency") or {})
+        limits.update(tool_concurrency or {})
+        self.default_limit = limits.pop("default", DEFAULT_TOOL_CONCURRENCY)
+        self.limits = limits
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="mcp-tool"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(
+                self.limits.get(name, self.default_limit)
+            )
+        return self._semaphores[name]
+
+    def _stats(self, name: str) -> Dict[str, Any]:
+        if name not in self._metrics:
+            self._metrics[name] = {
+                "calls": 0,
+                "failed": 0,
+                "queued": 0,
+                "running": 0,
+                "max_queued": 0,
+                "total_wait_ms": 0.0,
+                "max_wait_ms": 0.0,
+                "total_run_ms": 0.0,
+            }
+        return self._metrics[name]
+
+    async def call(
+        self,
+        name: str,
+        arguments: Dict[str, Any],
+        postprocess: Optional[Callable[[Any], Any]] = None,
+        timing: Optional[Dict[str, float]] = None,
+    ) -> Any:
+        """
+        Executes tool `name` in the pool and returns its result.
+        `postprocess` (e.g. serialization) also runs in the worker thread.
+        If given, `timing["run_ms"]` is set to the time spent in the worker,
+        excluding the wait for a slot (also when the tool fails).
+        """
+        handler = self.handlers.get(name)
+        if not handler:
+            raise ValueError(f"Tool '{name}' not found.")
+
+        stats = self._stats(name)
+        stats["queued"] += 1
+        stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+        enqueued_at = time.perf_counter()
+
+        semaphore = self._semaphore(name)
+        try:
+            await semaphore.acquire()
+        finally:
+            stats["queued"] -= 1
+
+        wait_ms = (time.perf_counter() - enqueued_at) * 1000
+        stats["running"] += 1
+        stats["total_wait_ms"] += wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+        started_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            # The handler sees the caller's context (e.g. the pinned generation)
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(
+                    context.run, self._run, handler, arguments, postprocess, timing
+                ),
+            )
+        except Exception:
+            stats["failed"] += 1
+            raise
+        finally:
+            semaphore.release()
+            stats["running"] -= 1
+            stats["calls"] += 1
+            stats["total_run_ms"] += (time.perf_counter() - started_at) * 1000
+
+    @staticmethod
+    def _run(
+        handler: Callable, arguments: Dict[str, Any], postprocess, timing=None
+    ) -> Any:
+        started_at = time.perf_counter()
+        try:
+            result = handler(**arguments)
+            if postprocess:
+                result = postprocess(result)
+            return result
+        finally:
+            if timing is not None:
+                timing["run_ms"] = (time.perf_counter() - started_at) * 1000
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of per-tool queueing and execution counters."""
+        tools = {}
+        for name, stats in self._metrics.items():
+            calls = stats["calls"] or 1
+            tools[name] = {
+                **stats,
+                "limit": self.limits.get(name, self.default_limit),
+                "avg_wait_ms": round(stats["total_wait_ms"] / calls, 2),
+                "avg_run_ms": round(stats["total_run_ms"] / calls, 2),
+                "total_wait_ms": round(stats["total_wait_ms"], 2),
+                "max_wait_ms": round(stats["max_wait_ms"], 2),
+                "total_run_ms": round(stats["total_run_ms"], 2),
+            }
+        return {"max_workers": self.max_workers, "tools": tools}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
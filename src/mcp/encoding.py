@@ -0,0 +1,82 @@
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+
+# Optional binary encoding (ormsgpack ships with langgraph; msgpack also works)
+try:
+    import ormsgpack as _msgpack
+except ImportError:
+    try:
+        import msgpack as _msgpack
+    except ImportError:
+        _msgpack = None
+
+# Tabular results (list of row dicts) can be re-encoded column-wise:
+# - "columnar": {"columns": [...], "values": [[col 1 values], [col 2 values]]}
+# - "msgpack":  the same columnar object packed with MessagePack, base64'd
+# - "json":     legacy list of row dicts inside a text content block
+DEFAULT_ENCODING = "columnar"
+SUPPORTED_ENCODINGS = ["columnar", "json"] + (["msgpack"] if _msgpack else [])
+
+# Tools whose results are tabular (list of rows with the same keys)
+TABULAR_TOOLS = {"query_sql"}
+
+
+def negotiate(preferred: Optional[List[str]]) -> str:
+    """Picks the first client-preferred encoding this server supports."""
+    for encoding in preferred or []:
+        if encoding in SUPPORTED_ENCODINGS:
+            return encoding
+    return DEFAULT_ENCODING
+
+
+def to_columns(rows: List[dict]) -> Tuple[List[str], List[list]]:
+    """Transposes row dicts into column names plus one value array per column."""
+    if not rows:
+        return [], []
+    columns = list(rows[0].keys())
+    values = [[row.get(col) for row in rows] for col in columns]
+    return columns, values
+
+
+def encode_tool_result(result: Any, encoding: str, tabular: bool) -> str:
+    """
+    Serializes a tool result into the JSON text of an MCP `result` object.
+    Runs once, in the worker thread, so the event loop never re-encodes
+    large payloads.
+    """
+    is_table = (
+        tabular
+        and encoding != "json"
+        and isinstance(result, list)
+        and all(isinstance(row, dict) for row in result)
+    )
+
+    if not is_table:
+        if isinstance(result, (dict, list)):
+            text_content = json.dumps(result, default=str)
+        else:
+            text_content = str(result)
+        return json.dumps({"content": [{"type": "text", "text": text_content}]})
+
+    columns, values = to_columns(result)
+    summary = [{"type": "text", "text": f"{len(result)} rows ({encoding})"}]
+
+    if encoding == "msgpack":
+        packed = _msgpack.packb({"columns": columns, "values": values})
+        structured = {
+            "encoding": "msgpack",
+            "rowCount": len(result),
+            "data": base64.b64encode(packed).decode("ascii"),
+        }
+    else:
+        structured = {
+            "encoding": "columnar",
+            "rowCount": len(result),
+            "columns": columns,
+            "values": values,
+        }
+
+    return json.dumps(
+        {"content": summary, "structuredContent": structured}, default=str
+    )
@@ -1,16 +1,32 @@
+import argparse
 import asyncio
+import json
+import logging
 from typing import Any, Callable, Dict, List, Optional
 
 import mcp.types as types
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 
+from src.config import get_settings
+from src.mcp.admission import AdmissionController, AdmissionError, current_client
+from src.mcp.dispatcher import ToolDispatcher
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("stdio", "tcp", "http")
+
 # Initialize low-level server
 app = Server("civic-audit-mcp")
 
 # Registry for tool handlers
 _TOOL_HANDLERS: Dict[str, Callable] = {}
 
+# Every transport runs the (synchronous) handlers through this pool
+dispatcher = ToolDispatcher(_TOOL_HANDLERS)
+# ...and shares the same connection / per-client limits
+admission = AdmissionController()
+
 
 # --- ACTUAL IMPLEMENTATION ---
 
@@ -60,22 +76,45 @@ async def list_tools() -> List[types.Tool]:
     ]
 
 
+def _to_text(result: Any) -> str:
+    if isinstance(result, (dict, list)):
+        return json.dumps(result, default=str)
+    return str(result)
+
+
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> List[types.TextContent]:
-    handler = _TOOL_HANDLERS.get(name)
-    if not handler:
+    if name not in _TOOL_HANDLERS:
         raise ValueError(f"Tool {name} not found")
 
+    # Session opened by the transport runner (see run_stdio / run_http)
+    client = current_client.get()
+    if client:
+        try:
+            admission.admit(client)
+        except AdmissionError as e:
+            return [types.TextContent(type="text", text=f"Error: {str(e)}")]
+
+    timing = {"run_ms": 0.0}
+    sent_bytes = 0
     try:
-        result = handler(**arguments)
-        return [types.TextContent(type="text", text=str(result))]
+        text = await dispatcher.call(name, arguments or {}, _to_text, timing)
+        if client:
+            admission.check_result(client, len(text))
+        sent_bytes = len(text)
+        return [types.TextContent(type="text", text=text)]
     except Exception as e:
         return [types.TextContent(type="text", text=f"Error: {str(e)}")]
+    finally:
+        if client:
+            # Charged with the worker time: queueing is not query time
+            admission.release(client, timing["run_ms"], sent_bytes)
 
 
 # --- TOOL DEFINITIONS ---
 
 from src.tools.database import (
+    column_values as tool_column_values,
     describe_table as tool_describe_table,
     list_tables as tool_list_tables,
     query_sql as tool_query_sql,
@@ -136,6 +175,35 @@ def search_definitions(query: str) -> str:
     return tool_search_definitions(query)
 
 
+@register_tool(
+    name="column_values",
+    description=(
+        "Returns the precomputed catalog of a table's categorical columns: distinct "
+        "values, their frequencies and labels (e.g. codigo_funcao '10' = Saúde), plus "
+        "min/max ranges of numeric and date columns. Use `search` to find the code "
+        "for a name instead of running SELECT DISTINCT."
+    ),
+    input_schema={
+        "type": "object",
+        "properties": {
+            "table_name": {"type": "string"},
+            "column_name": {"type": "string"},
+            "search": {
+                "type": "string",
+                "description": "Filter values by code or label (e.g. 'saude')",
+            },
+        },
+        "required": ["table_name"],
+    },
+    examples=["despesas", "licitacoes"],
+    defer_loading=False  # Critical discovery tool
+)
+def column_values(
+    table_name: str, column_name: str = None, search: str = None
+) -> str:
+    return tool_column_values(table_name, column_name, search)
+
+
 @register_tool(
     name="search_tools",
     description="Searches for available capabilities/tools. Use this to find deferred tools.",
@@ -179,8 +247,151 @@ def list_tables() -> str:
     return tool_list_tables()
 
 
+# --- TRANSPORTS ---
+
+
+async def run_stdio():
+    client = admission.open_session("stdio")
+    current_client.set(client)
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream, write_stream, app.create_initialization_options()
+            )
+    finally:
+        admission.close_session(client)
+
+
+async def run_http(host: str, port: int):
+    """
+    Serves MCP over HTTP/SSE (GET /sse + POST /messages/) with uvicorn.
+    Connections are kept alive between requests; /metrics exposes the
+    tool dispatcher counters.
+    """
+    import uvicorn
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Mount, Route
+
+    http_settings = get_settings().get("mcp", {}).get("http", {})
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        try:
+            client = admission.open_session(str(request.client))
+        except AdmissionError as e:
+            return JSONResponse({"error": str(e)}, status_code=503)
+
+        # Tool calls of this MCP session run in tasks spawned by app.run,
+        # which inherit the context variable
+        token = current_client.set(client)
+        try:
+            async with sse.connect_sse(
+                request.scope, request.receive, request._send
+            ) as (read_stream, write_stream):
+                await app.run(
+                    read_stream, write_stream, app.create_initialization_options()
+                )
+        finally:
+            current_client.reset(token)
+            admission.close_session(client)
+        return Response()
+
+    async def handle_metrics(request):
+        return JSONResponse(
+            {**dispatcher.metrics(), "admission": admission.metrics()}
+        )
+
+    starlette_app = Starlette(
+        routes=[
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ]
+    )
+    config = uvicorn.Config(
+        starlette_app,
+        host=host,
+        port=port,
+        timeout_keep_alive=http_settings.get("keep_alive_seconds", 75),
+        log_level="info",
+    )
+    print(f"Serving HTTP/SSE on {host}:{port}")
+    await uvicorn.Server(config).serve()
+
+
+async def serve(
+    transports: List[str],
+    host: str = "0.0.0.0",
+    port: int = 8000,
+    http_port: int = 8001,
+    socket_path: Optional[str] = None,
+):
+    """Serves the shared tool registry over every requested transport."""
+    from src.mcp import tcp_server
+
+    runners = []
+    if "stdio" in transports:
+        runners.append(run_stdio())
+    if "tcp" in transports:
+        runners.append(
+            tcp_server.serve(
+                dispatcher, admission, host=host, port=port, socket_path=socket_path
+            )
+        )
+    if "http" in transports:
+        runners.append(run_http(host, http_port))
+
+    try:
+        await asyncio.gather(*runners)
+    finally:
+        dispatcher.shutdown()
+
+
 def main():
-    asyncio.run(stdio_server(app))
+    from src.mcp.tcp_server import get_socket_path
+
+    parser = argparse.ArgumentParser(description="CivicAudit MCP Server")
+    parser.add_argument(
+        "--transport",
+        default="stdio",
+        help=f"Comma-separated transports to serve: {', '.join(TRANSPORTS)}",
+    )
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8000, help="TCP port")
+    parser.add_argument("--http-port", type=int, default=8001, help="HTTP/SSE port")
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=get_socket_path(),
+        help="Unix socket path served alongside TCP",
+    )
+    args = parser.parse_args()
+
+    transports = [t.strip() for t in args.transport.split(",") if t.strip()]
+    unknown = [t for t in transports if t not in TRANSPORTS]
+    if unknown:
+        parser.error(f"Unknown transport(s): {unknown}")
+    if "stdio" in transports and len(transports) > 1:
+        # stdout carries the protocol; other transports would write to it
+        parser.error("stdio cannot be combined with other transports")
+
+    if "stdio" not in transports:
+        logging.basicConfig(level=logging.INFO)
+
+    try:
+        asyncio.run(
+            serve(
+                transports,
+                host=args.host,
+                port=args.port,
+                http_port=args.http_port,
+                socket_path=args.socket,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
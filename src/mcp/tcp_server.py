@@ -1,29 +1,226 @@
 import asyncio
 import json
 import logging
+import os
 import traceback
+from typing import Optional
 
-from src.tools.database import describe_table, list_tables, query_sql, search_definitions
-
-# Map tool names to functions
-TOOL_MAP = {
-    "list_tables": list_tables,
-    "query_sql": query_sql,
-    "describe_table": describe_table,
-    "search_definitions": search_definitions,
-}
+from src.config import get_settings
+from src.etl.database import DatabaseManager
+from src.mcp import encoding
+from src.mcp.admission import AdmissionController, AdmissionError
+from src.mcp.dispatcher import ToolDispatcher
 
 logger = logging.getLogger(__name__)
 
+# Max size of one request line (batches of queries can be long)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+# Tools run on a bounded pool; the event loop only does socket I/O.
+# Bound by `serve` to the dispatcher over the shared tool registry.
+dispatcher: Optional[ToolDispatcher] = None
+# Connection / per-client limits, shared with the other transports
+admission: Optional[AdmissionController] = None
+# Resolves the data generation a sandboxed script asks for
+db_manager = DatabaseManager()
+
+
+def _error(msg_id, code: int, message: str) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": msg_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def _response(msg_id, result_json: str) -> str:
+    # The result is already JSON text (encoded in the worker thread)
+    msg_id_json = json.dumps(msg_id)
+    return f'{{"jsonrpc": "2.0", "id": {msg_id_json}, "result": {result_json}}}'
+
+
+async def handle_request(req, session: dict) -> Optional[str]:
+    """
+    Processes one JSON-RPC request object and returns its serialized
+    response (None for notifications, i.e. requests without an id).
+    `session` holds per-connection state such as the negotiated encoding.
+    """
+    if not isinstance(req, dict):
+        return json.dumps(_error(None, -32600, "Invalid Request"))
+
+    msg_id = req.get("id")
+    try:
+        resp = await _dispatch(req, session)
+    except Exception as e:
+        # Every request with an id gets an answer: pipelined clients wait
+        # for it before anything else on the connection
+        logger.error(f"Internal error handling {req.get('method')!r}: {e}")
+        traceback.print_exc()
+        resp = _error(msg_id, -32603, f"Internal error: {e}")
+
+    if "id" not in req or resp is None:
+        return None
+    return resp if isinstance(resp, str) else json.dumps(resp, default=str)
+
+
+def _invalid_params(msg_id, message: str) -> dict:
+    return _error(msg_id, -32602, f"Invalid params: {message}")
+
+
+async def _dispatch(req: dict, session: dict):
+    """Response (dict or serialized str) to one request; None if it has none."""
+    resp = None
+    method = req.get("method")
+    msg_id = req.get("id")
+
+    # "params": null is the same as no params
+    params = req.get("params") or {}
+    if not isinstance(params, dict):
+        return _invalid_params(msg_id, "params must be an object")
+
+    if method == "initialize":
+        capabilities = params.get("capabilities") or {}
+        if not isinstance(capabilities, dict):
+            return _invalid_params(msg_id, "capabilities must be an object")
+        session["encoding"] = encoding.negotiate(capabilities.get("resultEncodings"))
+        resp = {
+            "jsonrpc": "2.0",
+            "id": msg_id,
+            "result": {
+                "protocolVersion": "2024-11-05",
+                "serverInfo": {"name": "CivicAudit TCP", "version": "2.0"},
+                "capabilities": {
+                    "batch": True,
+                    "pipelining": True,
+                    "maxInflight": admission.limits["max_inflight_per_client"],
+                    "resultEncoding": session["encoding"],
+                    "resultEncodings": encoding.SUPPORTED_ENCODINGS,
+                },
+            },
+        }
+
+    elif method == "server/metrics":
+        resp = {
+            "jsonrpc": "2.0",
+            "id": msg_id,
+            "result": {**dispatcher.metrics(), "admission": admission.metrics()},
+        }
+
+    elif method == "tools/call":
+        name = params.get("name")
+        args = params.get("arguments") or {}
+        # Generation pinned by the agent request that runs the script
+        generation = params.get("generation")
+        if not isinstance(name, str):
+            return _invalid_params(msg_id, "name must be a string")
+        if not isinstance(args, dict):
+            return _invalid_params(msg_id, "arguments must be an object")
+        if generation is not None and not isinstance(generation, str):
+            return _invalid_params(msg_id, "generation must be a string")
+
+        # Per-call override, otherwise the connection's negotiated encoding
+        result_encoding = params.get("encoding") or session.get("encoding")
+        if result_encoding not in encoding.SUPPORTED_ENCODINGS:
+            result_encoding = encoding.DEFAULT_ENCODING
+
+        def _serialize(result) -> str:
+            return encoding.encode_tool_result(
+                result, result_encoding, name in encoding.TABULAR_TOOLS
+            )
+
+        client = session["client"]
+        try:
+            # Fast-fail when the client is over its limits
+            admission.admit(client)
+        except AdmissionError as e:
+            return json.dumps(_error(msg_id, e.code, str(e)))
+
+        timing = {"run_ms": 0.0}
+        sent_bytes = 0
+        try:
+            # Runs in the worker pool (serialization included)
+            with db_manager.pin_generation(generation):
+                result_json = await dispatcher.call(name, args, _serialize, timing)
+            admission.check_result(client, len(result_json))
+            sent_bytes = len(result_json)
+            resp = _response(msg_id, result_json)
+        except AdmissionError as e:
+            resp = _error(msg_id, e.code, str(e))
+        except Exception as e:
+            logger.error(f"Tool call error: {e}")
+            traceback.print_exc()
+            resp = _error(msg_id, -32000, str(e))
+        finally:
+            # Charged with the worker time: queueing is not query time
+            admission.release(client, timing["run_ms"], sent_bytes)
+
+    elif "id" in req:
+        resp = _error(msg_id, -32601, f"Method '{method}' not found")
+
+    return resp
+
+
+async def handle_message(payload, session: dict) -> Optional[str]:
+    """
+    Handles a single request or a JSON-RPC batch array. Batch entries run
+    concurrently; their responses are returned together in one array.
+    """
+    if isinstance(payload, list):
+        if not payload:
+            return json.dumps(_error(None, -32600, "Invalid Request: empty batch"))
+        responses = await asyncio.gather(
+            *(handle_request(r, session) for r in payload)
+        )
+        responses = [r for r in responses if r is not None]
+        return f"[{', '.join(responses)}]" if responses else None
+    return await handle_request(payload, session)
+
 
 async def handle_client(reader, writer):
     """
     Handles a single TCP client connection.
     Implements a simple JSON-RPC style protocol for the Sandbox shim.
+
+    Requests are pipelined: each line is processed in its own task and its
+    response is written as soon as it is ready, so responses may arrive out
+    of order and clients must correlate them by id.
     """
     addr = writer.get_extra_info("peername")
+
+    try:
+        client = admission.open_session(str(addr))
+    except AdmissionError as e:
+        print(f"DEBUG: Rejected connection from {addr}: {e}")
+        writer.write((json.dumps(_error(None, e.code, str(e))) + "\n").encode())
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+        return
+
     print(f"DEBUG: Accepted connection from {addr}")
 
+    write_lock = asyncio.Lock()
+    pending = set()
+    session = {"encoding": encoding.DEFAULT_ENCODING, "client": client}
+
+    async def respond(payload):
+        try:
+            resp = await handle_message(payload, session)
+        except Exception as e:
+            logger.error(f"Internal error: {e}")
+            traceback.print_exc()
+            msg_id = payload.get("id") if isinstance(payload, dict) else None
+            resp = json.dumps(_error(msg_id, -32603, f"Internal error: {e}"))
+        if resp is None:
+            return
+        try:
+            resp_str = resp + "\n"
+            async with write_lock:
+                writer.write(resp_str.encode())
+                await writer.drain()
+        except Exception as e:
+            print(f"Connection Error: {e}")
+
     try:
         while True:
             data = await reader.readline()
@@ -35,79 +232,36 @@ async def handle_client(reader, writer):
             if not message:
                 continue
 
-            # It's a JSON-RPC message
+            # It's a JSON-RPC message (or a batch of them)
             try:
-                req = json.loads(message)
+                payload = json.loads(message)
             except json.JSONDecodeError:
                 print(f"DEBUG: Invalid JSON from {addr}")
+                resp_str = json.dumps(_error(None, -32700, "Parse error")) + "\n"
+                async with write_lock:
+                    writer.write(resp_str.encode())
+                    await writer.drain()
                 continue
 
-            resp = None
-            method = req.get("method")
-            msg_id = req.get("id")
-
-            if method == "initialize":
-                resp = {
-                    "jsonrpc": "2.0",
-                    "id": msg_id,
-                    "result": {
-                        "protocolVersion": "2024-11-05",
-                        "serverInfo": {"name": "CivicAudit TCP", "version": "2.0"},
-                    },
-                }
-
-            elif method == "tools/call":
-                params = req.get("params", {})
-                name = params.get("name")
-                args = params.get("arguments", {})
-
-                try:
-                    if name not in TOOL_MAP:
-                        raise ValueError(f"Tool '{name}' not found.")
-
-                    tool_func = TOOL_MAP[name]
-                    
-                    # Call the tool (synchronous tools)
-                    result = tool_func(**args)
-
-                    # Serialize result
-                    # Shim expects formatted content or structuredContent
-                    # Our tools return strings mostly, or lists of dicts (for query_sql)
-                    if isinstance(result, (dict, list)):
-                        text_content = json.dumps(result, default=str)
-                    else:
-                        text_content = str(result)
-
-                    content_list = [{"type": "text", "text": text_content}]
-
-                    resp = {
-                        "jsonrpc": "2.0",
-                        "id": msg_id,
-                        "result": {"content": content_list},
-                    }
-                except Exception as e:
-                    logger.error(f"Tool call error: {e}")
-                    traceback.print_exc()
-                    resp = {
-                        "jsonrpc": "2.0",
-                        "id": msg_id,
-                        "error": {"code": -32000, "message": str(e)},
-                    }
-
-            if resp:
-                resp_str = json.dumps(resp) + "\n"
-                writer.write(resp_str.encode())
-                await writer.drain()
+            task = asyncio.create_task(respond(payload))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
 
     except Exception as e:
         print(f"Connection Error: {e}")
     finally:
+        # Let in-flight requests finish before closing the connection
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        admission.close_session(client)
         writer.close()
         await writer.wait_closed()
 
 
 async def start_tcp_server(host="0.0.0.0", port=8000):
-    server = await asyncio.start_server(handle_client, host, port)
+    server = await asyncio.start_server(
+        handle_client, host, port, limit=MAX_MESSAGE_BYTES
+    )
 
     addr = server.sockets[0].getsockname()
     print(f"Serving TCP on {addr}")
@@ -116,17 +270,86 @@ async def start_tcp_server(host="0.0.0.0", port=8000):
         await server.serve_forever()
 
 
+async def start_unix_server(path: str):
+    """
+    Serves the same JSON-RPC protocol over a Unix domain socket. Sandbox
+    containers get the socket's directory bind-mounted read-only, so tool
+    calls cost local IPC instead of a trip through the network stack.
+    """
+    socket_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(socket_dir, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)  # Stale socket from a previous run
+
+    server = await asyncio.start_unix_server(
+        handle_client, path, limit=MAX_MESSAGE_BYTES
+    )
+    # Sandbox processes may run as a different user
+    os.chmod(path, 0o666)
+    print(f"Serving Unix socket on {path}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def get_socket_path() -> Optional[str]:
+    """Unix socket path from MCP_SOCKET or `mcp.socket_path` (None disables)."""
+    return os.environ.get("MCP_SOCKET") or get_settings().get("mcp", {}).get(
+        "socket_path"
+    )
+
+
+async def serve(
+    tool_dispatcher: ToolDispatcher,
+    admission_controller: AdmissionController,
+    host="0.0.0.0",
+    port=8000,
+    socket_path: Optional[str] = None,
+):
+    """Runs the TCP listener and, if configured, the Unix socket listener."""
+    global dispatcher, admission
+    dispatcher = tool_dispatcher
+    admission = admission_controller
+
+    servers = [start_tcp_server(host=host, port=port)]
+    if socket_path:
+        servers.append(start_unix_server(socket_path))
+    await asyncio.gather(*servers)
+
+
 if __name__ == "__main__":
+    # Prefer `python src/mcp/server.py --transport tcp`; kept for compatibility.
     import argparse
 
+    from src.mcp.server import admission as registry_admission
+    from src.mcp.server import dispatcher as registry_dispatcher
+
     logging.basicConfig(level=logging.INFO)
-    
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to")
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=get_socket_path(),
+        help="Unix socket path to also listen on",
+    )
     args = parser.parse_args()
 
     try:
-        asyncio.run(start_tcp_server(host=args.host, port=args.port))
+        asyncio.run(
+            serve(
+                registry_dispatcher,
+                registry_admission,
+                host=args.host,
+                port=args.port,
+                socket_path=args.socket,
+            )
+        )
     except KeyboardInterrupt:
         pass
@@ -0,0 +1,101 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.config import get_settings
+
+PROMPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Prompts assembled from several files, in order
+COMPOSITES = {
+    "analyst": ["components/identity", "components/rules", "components/examples"],
+}
+
+
+class PromptRegistry:
+    """
+    Prompt templates from src/prompts, read and compiled once per process.
+
+    Every chat prompt is a static system message (the markdown file, the
+    same bytes on every call) followed by a human message holding all the
+    variable parts, so providers can serve the shared prefix from their
+    prompt cache. With `prompts.hot_reload` (default: on when `app.env` is
+    "development") edited files are picked up without a restart.
+    """
+
+    def __init__(self, root: str = PROMPTS_DIR, hot_reload: Optional[bool] = None):
+        settings = get_settings()
+        if hot_reload is None:
+            hot_reload = settings.get("prompts", {}).get("hot_reload")
+        if hot_reload is None:
+            hot_reload = settings.get("app", {}).get("env") == "development"
+        self.root = root
+        self.hot_reload = hot_reload
+
+        self._lock = threading.Lock()
+        self._texts: Dict[str, Tuple[Tuple[int, ...], str]] = {}
+        self._templates: Dict[Tuple[str, str], Tuple[str, ChatPromptTemplate]] = {}
+
+    def _sources(self, name: str) -> List[str]:
+        parts = COMPOSITES.get(name, [name])
+        return [os.path.join(self.root, f"{part}.md") for part in parts]
+
+    def _read(self, name: str) -> Tuple[Tuple[int, ...], str]:
+        paths = self._sources(name)
+        versions = tuple(os.stat(path).st_mtime_ns for path in paths)
+        parts = []
+        for path in paths:
+            with open(path, "r") as f:
+                parts.append(f.read())
+        return versions, "\n\n".join(parts)
+
+    def text(self, name: str) -> str:
+        """System prompt `name` (file name without .md, or a composite)."""
+        with self._lock:
+            cached = self._texts.get(name)
+            if cached and self.hot_reload:
+                versions = tuple(
+                    os.stat(path).st_mtime_ns for path in self._sources(name)
+                )
+                if versions != cached[0]:
+                    cached = None
+            if cached is None:
+                cached = self._read(name)
+                self._texts[name] = cached
+            return cached[1]
+
+    def chat(self, name: str, suffix: str = "{input}") -> ChatPromptTemplate:
+        """
+        Compiled chat template: system prompt `name` as the stable prefix,
+        then `suffix`, the human message template with every variable.
+        """
+        system = self.text(name)
+        key = (name, suffix)
+        with self._lock:
+            cached = self._templates.get(key)
+            if cached is None or cached[0] is not system:
+                template = ChatPromptTemplate.from_messages(
+                    [("system", system), ("human", suffix)]
+                )
+                cached = (system, template)
+                self._templates[key] = cached
+            return cached[1]
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> PromptRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
+
+
+def get_prompt(name: str, suffix: str = "{input}") -> ChatPromptTemplate:
+    """Shortcut for `get_registry().chat(name, suffix)`."""
+    return get_registry().chat(name, suffix)
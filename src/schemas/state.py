@@ -11,10 +11,14 @@ class AgentState(TypedDict):
 
     messages: Annotated[List[BaseMessage], add_messages]
     guardrail_verdict: Optional[str]
+    guardrail_source: Optional[str]  # "rules", "model" (local), "llm" or "llm_cache"
+    data_generation: Optional[str]  # Database generation pinned for the request
     plan: Optional[str]  # Decomposition of the user query
     sql_query: Optional[str] # SQL generated by Fiscal Agent
+    sql_warnings: Optional[List[str]]  # Validation warnings on sql_query
     code: str
     output: str
+    execution_stats: Optional[dict]  # Sandbox timings / resource usage of the last run
     error: Optional[str]
     evaluation: Optional[str]  # Critic's feedback
     iterations: int
@@ -1,4 +1,6 @@
 from src.etl.database import DatabaseManager as Database
+from src.etl.database import normalize_text
+from src.tools.schema_context import INTERNAL_TABLES
 
 db = Database()
 
@@ -30,6 +32,8 @@ def search_definitions(query: str) -> list[dict]:
 
     output = []
     for table, ddl in results.items():
+        if table in INTERNAL_TABLES:
+            continue
         output.append({"table": table, "definition": ddl})
     return output
 
@@ -37,4 +41,27 @@ def search_definitions(query: str) -> list[dict]:
 def list_tables():
     """Lists all available tables in the database."""
     tables = db.get_all_tables()
-    return tables
+    # Bookkeeping tables (catalog, ETL metadata) are not data to query
+    return [t for t in tables if t not in INTERNAL_TABLES]
+
+
+def column_values(table_name: str, column_name: str = None, search: str = None):
+    """
+    Returns known values, frequencies and ranges for catalogued columns.
+    Optionally filters values whose code or label matches `search`
+    (accent-insensitive, e.g. 'saude' -> codigo_funcao '10').
+    """
+    catalog = db.get_column_catalog(table_name, column_name)
+    if not catalog:
+        return f"No catalog entries for '{table_name}'. Run the ETL to build it."
+
+    if search:
+        term = normalize_text(search)
+        for entry in catalog:
+            if "values" in entry:
+                entry["values"] = [
+                    v for v in entry["values"]
+                    if term in normalize_text(v["value"])
+                    or term in normalize_text(v["label"] or "")
+                ]
+    return catalog
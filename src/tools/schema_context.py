@@ -0,0 +1,309 @@
+import math
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.config import get_settings
+from src.etl.database import DatabaseManager, normalize_text, parse_ddl_labels
+
+DEFAULT_TOKEN_BUDGET = 1200
+
+# Bookkeeping tables never offered to the SQL generator
+INTERNAL_TABLES = {"etl_metadata", "column_catalog", "column_catalog_values"}
+
+# Catalog values listed per matched categorical column
+MAX_VALUES_PER_COLUMN = 12
+
+# Terms are accent-free word prefixes ("licitações" -> "licit"), so plural
+# and inflected forms of a word match each other
+STEM_LENGTH = 5
+STOPWORDS = {
+    "a", "as", "o", "os", "de", "da", "das", "do", "dos", "e", "em", "no", "na",
+    "nos", "nas", "com", "por", "para", "qual", "quais", "quanto", "quantos",
+    "quantas", "que", "um", "uma", "the", "of", "in", "and", "for", "what",
+    "how", "many", "much", "is", "are", "ex", "eg", "table", "tabela",
+}
+
+_COLUMN_LINE_RE = re.compile(r"^\s*(\w+)\s+[A-Za-z]+\b[^-]*(?:--\s*(.*))?$")
+_COMMENT_LINE_RE = re.compile(r"^\s*--\s*(.*?)\s*$")
+_TABLE_COMMENT_RE = re.compile(r"/\*\s*(?:Metadata:\s*)?(.*?)\s*\*/", re.S)
+_GENERATED_RE = re.compile(r"json_extract\(\s*raw_data\s*,\s*'([^']+)'\s*\)")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+
+except Exception:  # tiktoken missing or its encoding cannot be downloaded
+
+    def count_tokens(text: str) -> int:
+        return math.ceil(len(text) / 4)
+
+
+# Portuguese plural endings folded before stemming ("pregões" -> "pregao")
+_PLURALS = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("s", ""))
+
+# Tables scoring below this fraction of the best match are left out
+MIN_RELATIVE_SCORE = 0.5
+
+
+def _singular(word: str) -> str:
+    for suffix, replacement in _PLURALS:
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def terms(text: str) -> List[str]:
+    words = _WORD_RE.findall(normalize_text(text or ""))
+    return [
+        _singular(w)[:STEM_LENGTH]
+        for w in words
+        if w not in STOPWORDS and len(w) > 1
+    ]
+
+
+class _Column:
+    def __init__(self, table: str, name: str, type_: str):
+        self.table = table
+        self.name = name
+        self.type = type_ or "ANY"
+        self.comment = ""
+        self.labels: Dict[str, str] = {}  # code -> label, from DDL comments
+        self.values: List[dict] = []  # catalog values (most frequent first)
+        self.terms: Dict[str, str] = {}  # term -> what it matched
+
+    def index(self):
+        for term in terms(self.name.replace("_", " ")) + terms(self.comment):
+            self.terms.setdefault(term, "name")
+        for code, label in self.labels.items():
+            for term in terms(label):
+                self.terms.setdefault(term, f"code:{code}")
+        for value in self.values:
+            for term in terms(f"{value['value']} {value['label'] or ''}"):
+                self.terms.setdefault(term, f"value:{value['value']}")
+
+
+class SchemaIndex:
+    """
+    Lexical index over the data tables of one data version: column names,
+    DDL comments, documented code mappings and catalog values, weighted by
+    inverse document frequency (rare terms such as "saude" outweigh "valor").
+    """
+
+    def __init__(self, db: DatabaseManager):
+        schema = db.get_start_schema()
+        self.tables: Dict[str, Tuple[str, List[_Column]]] = {}
+        conn = db.get_connection()
+        try:
+            for table, ddl in sorted(schema.items()):
+                if table in INTERNAL_TABLES or table.startswith("sqlite_"):
+                    continue
+                columns = [
+                    _Column(table, row[1], row[2])
+                    for row in conn.execute(f"PRAGMA table_xinfo({table})")
+                ]
+                self._annotate(ddl or "", columns)
+                match = _TABLE_COMMENT_RE.search(ddl or "")
+                description = " ".join(match.group(1).split()) if match else ""
+                self.tables[table] = (description, columns)
+        finally:
+            conn.close()
+
+        catalog = {
+            (entry["table_name"], entry["column_name"]): entry
+            for entry in db.get_column_catalog()
+        }
+        document_frequency: Dict[str, int] = {}
+        documents = 0
+        for table, (_, columns) in self.tables.items():
+            for column in columns:
+                entry = catalog.get((table, column.name))
+                if entry and entry["kind"] == "categorical":
+                    column.values = entry["values"]
+                column.index()
+                documents += 1
+                for term in column.terms:
+                    document_frequency[term] = document_frequency.get(term, 0) + 1
+        self.idf = {
+            term: math.log(1 + documents / count)
+            for term, count in document_frequency.items()
+        }
+
+    @staticmethod
+    def _annotate(ddl: str, columns: List[_Column]):
+        """Comments and code mappings of each column, from the DDL."""
+        by_name = {column.name: column for column in columns}
+        labels = parse_ddl_labels(ddl)
+        current = None
+        for line in ddl.splitlines():
+            column_match = _COLUMN_LINE_RE.match(line)
+            if column_match and column_match.group(1) in by_name:
+                current = by_name[column_match.group(1)]
+                current.comment = (column_match.group(2) or "").strip()
+                continue
+            comment_match = _COMMENT_LINE_RE.match(line)
+            if current and comment_match:
+                text = comment_match.group(1)
+                if ":" in text and text.split(":")[0].strip().isalnum():
+                    continue  # Code mapping, kept in labels
+                current.comment = f"{current.comment} {text}".strip()
+        for name, column_labels in labels.items():
+            if name in by_name:
+                by_name[name].labels = column_labels
+        # Promoted fields are appended by ALTER TABLE without comments
+        for column in columns:
+            if not column.comment:
+                generated = re.search(
+                    rf"\b{column.name}\b[^,]*GENERATED[^,]*?{_GENERATED_RE.pattern}",
+                    ddl,
+                    re.I,
+                )
+                if generated:
+                    column.comment = f"raw_data {generated.group(1)}"
+
+    def rank(self, question: str):
+        """
+        [(table, score, {column: (score, matches)})] for tables with a
+        matched column or description, best first; tables matching far
+        less than the best one are dropped.
+        """
+        question_terms = set(terms(question))
+        ranked = []
+        for table, (description, columns) in self.tables.items():
+            matched = {}
+            for column in columns:
+                hits = question_terms & column.terms.keys()
+                if hits:
+                    matched[column.name] = (
+                        sum(self.idf[t] for t in hits),
+                        {column.terms[t] for t in hits},
+                    )
+            table_terms = set(terms(f"{table} {description}"))
+            score = sum(s for s, _ in matched.values()) + 2 * len(
+                question_terms & table_terms
+            )
+            if score:
+                ranked.append((table, score, matched))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return [
+            item for item in ranked if item[1] >= ranked[0][1] * MIN_RELATIVE_SCORE
+        ]
+
+
+class SchemaContextBuilder:
+    """
+    Renders the part of the schema relevant to a question within a token
+    budget. Every selected table gets a compact column list; comments, code
+    mappings and known values follow for the columns the question matched,
+    then for the rest, until the budget is spent.
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        self.db = db or DatabaseManager()
+        self._lock = threading.Lock()
+        self._index: Optional[Tuple[str, SchemaIndex]] = None
+
+    def index(self) -> SchemaIndex:
+        version = self.db.data_version()
+        with self._lock:
+            if self._index is None or self._index[0] != version:
+                self._index = (version, SchemaIndex(self.db))
+            return self._index[1]
+
+    def build(self, question: str, token_budget: Optional[int] = None) -> str:
+        if token_budget is None:
+            token_budget = (
+                get_settings()
+                .get("agent", {})
+                .get("schema_token_budget", DEFAULT_TOKEN_BUDGET)
+            )
+        index = self.index()
+        ranked = index.rank(question)
+        if not ranked:
+            # Nothing matched: all tables, no detail beyond the column lists
+            ranked = [(table, 0.0, {}) for table in index.tables]
+
+        sections = []
+        details = []
+        for table, _, matched in ranked:
+            description, columns = index.tables[table]
+            header = f"{table}({', '.join(f'{c.name} {c.type}' for c in columns)})"
+            if description:
+                header += f" -- {description}"
+            sections.append(header)
+
+            for column in columns:
+                score, matches = matched.get(column.name, (0.0, set()))
+                detail = self._detail(column, matches)
+                if detail:
+                    details.append((score, f"- {table}.{column.name}: {detail}"))
+
+        # Matched columns first, then the remaining documented ones
+        details.sort(key=lambda item: item[0], reverse=True)
+        lines = []
+        used = 0
+        for section in sections:
+            cost = count_tokens(section) + 1
+            if lines and used + cost > token_budget:
+                break  # The best matching table is always included
+            lines.append(section)
+            used += cost
+
+        rendered_details = []
+        for _, detail in details:
+            cost = count_tokens(detail) + 1
+            if used + cost > token_budget:
+                continue
+            rendered_details.append(detail)
+            used += cost
+        if rendered_details:
+            lines.append("Columns:")
+            lines.extend(rendered_details)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _detail(column: _Column, matches: set) -> str:
+        parts = [column.comment] if column.comment else []
+        matched_codes = {m.split(":", 1)[1] for m in matches if ":" in m}
+        if column.labels:
+            codes = [
+                (code, label)
+                for code, label in column.labels.items()
+                if not matched_codes or code in matched_codes
+            ]
+            parts.append(
+                "codes " + ", ".join(f"'{code}'={label}" for code, label in codes)
+            )
+        elif column.values and matches:
+            values = [v for v in column.values if v["value"] in matched_codes] or (
+                column.values[:MAX_VALUES_PER_COLUMN]
+            )
+            more = len(column.values) - len(values)
+            parts.append(
+                "values "
+                + ", ".join(f"'{v['value']}'" for v in values)
+                + (f" (+{more} more)" if more > 0 else "")
+            )
+        return "; ".join(parts)
+
+
+_builder: Optional[SchemaContextBuilder] = None
+_builder_lock = threading.Lock()
+
+
+def build_schema_context(question: str, token_budget: Optional[int] = None) -> str:
+    """
+    Compact schema description of the tables and columns relevant to
+    `question`, within `token_budget` tokens (default
+    `agent.schema_token_budget`).
+    """
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = SchemaContextBuilder()
+    return _builder.build(question, token_budget)
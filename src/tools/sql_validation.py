@@ -0,0 +1,377 @@
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.etl.database import DatabaseManager, normalize_text
+
+# Comparisons whose right-hand literals are linted
+COMPARISON_OPERATORS = {"=", "==", "!=", "<>", "<", "<=", ">", ">="}
+# Functions returning TEXT: comparing them with a bare number is never true
+TEXT_FUNCTIONS = {
+    "substr",
+    "substring",
+    "strftime",
+    "date",
+    "trim",
+    "upper",
+    "lower",
+    "replace",
+}
+# Declared types of columns compared as text
+TEXT_TYPES = {"TEXT", "VARCHAR", "CHAR"}
+
+_BARE_IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+    | (?P<number>\d+(?:\.\d+)?)
+    | (?P<word>[A-Za-z_]\w*)
+    | (?P<op>==|!=|<>|<=|>=|[=<>])
+    | (?P<punct>.)
+    """,
+    re.S | re.X,
+)
+
+
+def tokenize_sql(sql: str) -> List[Tuple[str, str, int, int]]:
+    """(kind, text, start, end) tokens of a statement, minus whitespace/comments."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+class SchemaCatalog:
+    """
+    Column names and declared types of every table, plus the categorical
+    value catalog, for the data version they were read from.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, db: DatabaseManager):
+        self.columns: Dict[str, Dict[str, str]] = {}
+        tables = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'"
+            )
+        ]
+        for table in tables:
+            self.columns[table] = {
+                row[1]: (row[2] or "").upper()
+                for row in conn.execute(f'PRAGMA table_xinfo("{table}")')
+            }
+        self.identifiers = {name.lower() for name in self.columns}
+        for columns in self.columns.values():
+            self.identifiers.update(name.lower() for name in columns)
+
+        self.values: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for entry in db.get_column_catalog():
+            if entry["kind"] == "categorical":
+                self.values[(entry["table_name"], entry["column_name"])] = entry
+
+
+class SQLValidator:
+    """
+    Deterministic validation of generated SQL: the statement is compiled
+    (EXPLAIN, nothing is executed) on a read-only connection to the
+    published snapshot, so syntax errors and unknown tables or columns are
+    reported by SQLite itself. The columns it reads (collected with an
+    authorizer) are then linted against their declared types and the
+    column value catalog. Unambiguous mistakes are fixed in place.
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        self.db = db or DatabaseManager()
+        self._lock = threading.Lock()
+        self._catalog: Optional[Tuple[str, SchemaCatalog]] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db.db_path}?mode=ro", uri=True, timeout=1)
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def _schema(self, conn: sqlite3.Connection) -> SchemaCatalog:
+        version = self.db.data_version()
+        with self._lock:
+            if self._catalog is None or self._catalog[0] != version:
+                self._catalog = (version, SchemaCatalog(conn, self.db))
+            return self._catalog[1]
+
+    @staticmethod
+    def _compile(conn: sqlite3.Connection, sql: str) -> List[Tuple[str, str]]:
+        """Prepares the statement; returns the (table, column) pairs it reads."""
+        reads = []
+
+        def _authorize(action, arg1, arg2, db_name, trigger):
+            if action == sqlite3.SQLITE_READ and arg1 and arg2:
+                reads.append((arg1, arg2))
+            return sqlite3.SQLITE_OK
+
+        conn.set_authorizer(_authorize)
+        try:
+            conn.execute(f"EXPLAIN {sql}").fetchall()
+        finally:
+            conn.set_authorizer(None)
+        return reads
+
+    def validate(self, sql: str) -> Dict[str, Any]:
+        """
+        Returns {"valid", "sql", "errors", "warnings", "fixes"}. `sql` is the
+        statement with fixes applied; `errors` make the query invalid,
+        `warnings` are likely mistakes that cannot be fixed automatically.
+        """
+        result = {
+            "valid": False,
+            "sql": sql,
+            "errors": [],
+            "warnings": [],
+            "fixes": [],
+        }
+        statement = sql.strip().rstrip(";").strip()
+        if not statement:
+            result["errors"].append("Empty query.")
+            return result
+        if not re.match(r"^(SELECT|WITH)\b", statement, re.I):
+            result["errors"].append("Only SELECT queries are allowed.")
+            return result
+        if ";" in _without_strings(statement):
+            result["errors"].append("Only one statement is allowed.")
+            return result
+
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            result["warnings"].append(
+                f"Validation skipped (database unavailable: {e})."
+            )
+            result["valid"] = True
+            return result
+
+        try:
+            try:
+                reads = self._compile(conn, statement)
+            except sqlite3.Error as e:
+                result["errors"].append(str(e))
+                return result
+
+            schema = self._schema(conn)
+            edits = self._lint(conn, statement, reads, schema, result)
+            if edits:
+                fixed = statement
+                for start, end, text in sorted(edits, reverse=True):
+                    fixed = fixed[:start] + text + fixed[end:]
+                try:
+                    self._compile(conn, fixed)
+                    result["sql"] = fixed
+                except sqlite3.Error:
+                    # Keep the original statement; report the fixes as warnings
+                    result["warnings"].extend(result["fixes"])
+                    result["fixes"] = []
+            result["valid"] = True
+            return result
+        finally:
+            conn.close()
+
+    def _lint(
+        self, conn, sql, reads, schema: SchemaCatalog, result
+    ) -> List[Tuple[int, int, str]]:
+        tokens = tokenize_sql(sql)
+        read_tables = {table for table, _ in reads}
+        edits = []
+        self._lint_quoted(conn, sql, tokens, schema, result, edits)
+
+        for i, (kind, text, _, _) in enumerate(tokens):
+            operator = text.upper()
+            if not (
+                (kind == "op" and operator in COMPARISON_OPERATORS)
+                or (kind == "word" and operator in ("IN", "BETWEEN", "LIKE"))
+            ):
+                continue
+            left = self._left_operand(tokens, i, read_tables, schema)
+            if left is None:
+                continue
+            table, column, declared_type = left
+            for literal in _right_literals(tokens, i, operator):
+                l_kind, l_text, l_start, l_end = literal
+                if (
+                    l_kind == "number"
+                    and declared_type in TEXT_TYPES
+                    and "." not in l_text
+                ):
+                    edits.append((l_start, l_end, f"'{l_text}'"))
+                    result["fixes"].append(
+                        f"Quoted {l_text} compared with TEXT {column} ('{l_text}')."
+                    )
+                elif l_kind == "string" and table and operator != "LIKE":
+                    self._lint_value(table, column, literal, schema, result, edits)
+        return edits
+
+    def _lint_quoted(self, conn, sql, tokens, schema: SchemaCatalog, result, edits):
+        """
+        "value" is an identifier in SQL; SQLite silently falls back to a
+        string only when nothing (column, alias, CTE) has that name. Each
+        candidate is recompiled unquoted: if SQLite then reports no such
+        column, it was read as a string and is rewritten with single quotes.
+        """
+        for i, (kind, text, start, end) in enumerate(tokens):
+            if kind != "quoted" or not text.startswith('"'):
+                continue
+            if i and tokens[i - 1][1].upper() == "AS":
+                continue
+            name = _unquote(text)
+            if name.lower() in schema.identifiers:
+                continue
+            literal = _quote(name)
+            if not _BARE_IDENTIFIER_RE.match(name):
+                result["warnings"].append(
+                    f"{text} may be read as a string; string literals use single "
+                    f"quotes ({literal})."
+                )
+                continue
+            try:
+                self._compile(conn, sql[:start] + name + sql[end:])
+                continue  # Resolves to an alias, CTE or subquery column
+            except sqlite3.Error as e:
+                if str(e) != f"no such column: {name}":
+                    result["warnings"].append(
+                        f"{text} may be read as a string; string literals use "
+                        f"single quotes ({literal})."
+                    )
+                    continue
+            edits.append((start, end, literal))
+            result["fixes"].append(
+                f"{text} is not a column; string literals use single quotes "
+                f"({literal})."
+            )
+
+    @staticmethod
+    def _left_operand(tokens, i, read_tables, schema: SchemaCatalog):
+        """(table, column, declared type) of the expression left of tokens[i]."""
+        if i == 0:
+            return None
+        kind, text = tokens[i - 1][0], tokens[i - 1][1]
+        if kind == "word" and text.upper() == "NOT" and i > 1:
+            kind, text = tokens[i - 2][0], tokens[i - 2][1]
+        if kind == "punct" and text == ")":
+            # TEXT-returning function call: fn(...) op literal
+            depth = 0
+            for j in range(i - 1, -1, -1):
+                if tokens[j][1] == ")":
+                    depth += 1
+                elif tokens[j][1] == "(":
+                    depth -= 1
+                    if depth == 0:
+                        if j and tokens[j - 1][1].lower() in TEXT_FUNCTIONS:
+                            return None, tokens[j - 1][1] + "(...)", "TEXT"
+                        return None
+            return None
+        if kind not in ("word", "quoted"):
+            return None
+        column = _unquote(text)
+        matches = [
+            (table, schema.columns[table][name])
+            for table in read_tables
+            for name in schema.columns.get(table, {})
+            if name.lower() == column.lower()
+        ]
+        if not matches:
+            return None
+        types = {declared for _, declared in matches}
+        if len(types) > 1:
+            return None
+        table = matches[0][0] if len(matches) == 1 else None
+        return table, column, types.pop()
+
+    @staticmethod
+    def _lint_value(table, column, literal, schema: SchemaCatalog, result, edits):
+        entry = schema.values.get((table, column))
+        if not entry or not entry["values"]:
+            return
+        value = literal[1][1:-1].replace("''", "'")
+        known = {v["value"] for v in entry["values"]}
+        if value in known:
+            return
+        # A label used in place of its code ('Saúde' -> '10')
+        codes = [
+            v["value"]
+            for v in entry["values"]
+            if v["label"] and normalize_text(v["label"]) == normalize_text(value)
+        ]
+        if len(codes) == 1:
+            edits.append((literal[2], literal[3], _quote(codes[0])))
+            result["fixes"].append(
+                f"{table}.{column} stores codes: '{value}' is '{codes[0]}'."
+            )
+        elif entry["distinct_count"] <= len(entry["values"]):
+            examples = ", ".join(f"'{v}'" for v in list(known)[:5])
+            result["warnings"].append(
+                f"'{value}' is not a known value of {table}.{column} "
+                f"(e.g. {examples}); the filter matches no rows."
+            )
+
+
+def _without_strings(sql: str) -> str:
+    return "".join(
+        text
+        for kind, text, _, _ in tokenize_sql(sql)
+        if kind not in ("string", "quoted")
+    )
+
+
+def _unquote(identifier: str) -> str:
+    if identifier[:1] in ('"', "`", "[") and len(identifier) >= 2:
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+
+def _quote(value: str, quote: str = "'") -> str:
+    return quote + value.replace(quote, quote * 2) + quote
+
+
+def _right_literals(tokens, i, operator):
+    """Literal tokens compared by the operator at tokens[i]."""
+    following = tokens[i + 1:]
+    if operator == "IN":
+        if not following or following[0][1] != "(":
+            return []
+        literals = []
+        for token in following[1:]:
+            if token[1] == ")":
+                break
+            if token[0] in ("number", "string"):
+                literals.append(token)
+            elif token[1] != ",":
+                return []  # Subquery or expression list
+        return literals
+    if operator == "BETWEEN":
+        if len(following) >= 3 and following[1][1].upper() == "AND":
+            bounds = (following[0], following[2])
+            return [t for t in bounds if t[0] in ("number", "string")]
+        return []
+    if following and following[0][0] in ("number", "string"):
+        # Skip arithmetic (col = 2024 + 1) and concatenation
+        if len(following) > 1 and following[1][1] in ("+", "-", "*", "/", "|"):
+            return []
+        return [following[0]]
+    return []
+
+
+_validator: Optional[SQLValidator] = None
+_validator_lock = threading.Lock()
+
+
+def validate_sql(sql: str) -> Dict[str, Any]:
+    """Validates a generated query; see SQLValidator.validate."""
+    global _validator
+    with _validator_lock:
+        if _validator is None:
+            _validator = SQLValidator()
+    return _validator.validate(sql)
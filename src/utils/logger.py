@@ -120,6 +120,14 @@ def observe_node(event_type: str = "NODE_EXECUTION"):
                 
                 if error:
                     log_data["error"] = error
+
+                # Sandbox accounting (execute node), logged untruncated
+                if isinstance(result, dict) and result.get("execution_stats"):
+                    log_data["execution_stats"] = result["execution_stats"]
+
+                # Which guardrail stage decided (rules / model / llm)
+                if isinstance(result, dict) and result.get("guardrail_source"):
+                    log_data["guardrail_source"] = result["guardrail_source"]
                     
                 logger.info(f"Executed {func.__name__}", extra={"structured_data": log_data})
                 
@@ -0,0 +1,75 @@
+import pytest
+
+from src.config import get_settings
+from src.etl.database import DatabaseManager
+from src.tools.sql_validation import SQLValidator
+
+
+@pytest.fixture
+def validator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(
+        get_settings(),
+        "database",
+        {
+            "path": str(tmp_path / "audit.db"),
+            "generations_dir": str(tmp_path / "generations"),
+            "query_log": False,
+        },
+    )
+    db = DatabaseManager()
+    db.initialize_schema()
+    return SQLValidator(db)
+
+
+def test_quoted_string_is_fixed(validator):
+    result = validator.validate(
+        'SELECT SUM(valor_pago) FROM despesas WHERE municipio_id = "sobral"'
+    )
+
+    assert result["valid"]
+    assert result["sql"].endswith("municipio_id = 'sobral'")
+    assert len(result["fixes"]) == 1
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        # Explicit alias
+        'SELECT SUM(valor_pago) AS total FROM despesas ORDER BY "total" DESC',
+        # Implicit alias
+        "SELECT codigo_funcao, SUM(valor_pago) total FROM despesas "
+        'GROUP BY codigo_funcao ORDER BY "total" DESC',
+        # CTE name and column
+        "WITH gastos AS (SELECT SUM(valor_pago) AS total FROM despesas) "
+        'SELECT "total" FROM "gastos"',
+        # Derived-table column
+        'SELECT "soma" FROM (SELECT SUM(valor_pago) AS soma FROM despesas)',
+    ],
+)
+def test_resolved_identifiers_are_kept(validator, sql):
+    result = validator.validate(sql)
+
+    assert result["valid"]
+    assert result["sql"] == sql
+    assert result["fixes"] == []
+    assert result["warnings"] == []
+
+
+def test_unprobeable_quoted_name_is_only_a_warning(validator):
+    sql = 'SELECT SUM(valor_pago) FROM despesas WHERE municipio_id = "São Paulo"'
+    result = validator.validate(sql)
+
+    assert result["valid"]
+    assert result["sql"] == sql
+    assert result["fixes"] == []
+    assert len(result["warnings"]) == 1
+
+
+def test_number_compared_with_text_column_is_quoted(validator):
+    result = validator.validate(
+        "SELECT SUM(valor_pago) FROM despesas WHERE exercicio_orcamento = 2024"
+    )
+
+    assert result["valid"]
+    assert result["sql"].endswith("exercicio_orcamento = '2024'")